@@ -1,24 +1,36 @@
 import logging
-from typing import Iterator, Optional
+from typing import AsyncIterator, Iterator, Optional
 
 from . import bot as _bot
 from .report import Report
 from .report_type import ReportType
 get_bot_client = _bot.get_bot_client
+close_bot_clients = _bot.close_bot_clients
 BotResults = _bot.BotResults
 Prompt = _bot.Prompt
 PropertyDefinition = _bot.PropertyDefinition
 PropertyType = _bot.PropertyType
 Image = _bot.Image
 
-def run_bot(prompt : Prompt, config : dict = {}, logger : Optional[logging.Logger] = None) -> BotResults:
+def run_bot(prompt : Prompt, config : dict = {}, logger : Optional[logging.Logger] = None, chain_tokens : int = 0) -> BotResults:
     """
     Run the report bot with the given prompt.
     :param prompt: Prompt for bot.
     :param config: Bot client configuration.
     :param logger: Optional logger.
+    :param chain_tokens: Tokens used by previous reports in the chain, counted against the prompt's chain token budget.
     """
-    return get_bot_client(config.get("bot_client", "openai"), config, logger).run(prompt)
+    return get_bot_client(config.get("bot_client", "openai"), config, logger).run(prompt, chain_tokens)
+
+async def run_bot_async(prompt : Prompt, config : dict = {}, logger : Optional[logging.Logger] = None, chain_tokens : int = 0) -> BotResults:
+    """
+    Run the report bot with the given prompt from an asyncio event loop, many bots can run concurrently in one process.
+    :param prompt: Prompt for bot.
+    :param config: Bot client configuration.
+    :param logger: Optional logger.
+    :param chain_tokens: Tokens used by previous reports in the chain, counted against the prompt's chain token budget.
+    """
+    return await get_bot_client(config.get("bot_client", "openai"), config, logger).run_async(prompt, chain_tokens)
 
 def run_report(report_type : ReportType, config : dict = {}, logger : Optional[logging.Logger] = None) -> Iterator[Report]:
     """
@@ -30,11 +42,33 @@ def run_report(report_type : ReportType, config : dict = {}, logger : Optional[l
     :param logger: Optional logger.
     """
     report_values = {}
+    chain_tokens = 0
+    current_report_type : Optional[ReportType] = report_type
+    while current_report_type:
+        if logger: logger.info("Run report type '%s'." % current_report_type.name, extra={"report_prompt": current_report_type.prompt.to_dict()})
+        bot_results = run_bot(current_report_type.prompt, config, logger, chain_tokens)
+        report = Report(current_report_type, bot_results)
+        yield report
+        chain_tokens += bot_results.input_tokens + bot_results.output_tokens() + bot_results.hedged_tokens
+        report_values[report.type.name] = report.values
+        current_report_type = current_report_type.next(report_values)
+
+async def run_report_async(report_type : ReportType, config : dict = {}, logger : Optional[logging.Logger] = None) -> AsyncIterator[Report]:
+    """
+    Async version of `run_report`, return an async iterator where each iteration is the next report in the chain.
+
+    :param report_type: Report type of report to generate.
+    :param config: Bot client configuration.
+    :param logger: Optional logger.
+    """
+    report_values = {}
+    chain_tokens = 0
     current_report_type : Optional[ReportType] = report_type
     while current_report_type:
         if logger: logger.info("Run report type '%s'." % current_report_type.name, extra={"report_prompt": current_report_type.prompt.to_dict()})
-        bot_results = run_bot(current_report_type.prompt, config, logger)
+        bot_results = await run_bot_async(current_report_type.prompt, config, logger, chain_tokens)
         report = Report(current_report_type, bot_results)
         yield report
+        chain_tokens += bot_results.input_tokens + bot_results.output_tokens() + bot_results.hedged_tokens
         report_values[report.type.name] = report.values
-        current_report_type = current_report_type.next(report_values)
\ No newline at end of file
+        current_report_type = current_report_type.next(report_values)
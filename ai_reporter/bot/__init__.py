@@ -1,5 +1,6 @@
 from . import client as _client
 get_bot_client = _client.get_bot_client
+close_bot_clients = _client.close_bot_clients
 from . import prompt as _prompt
 Prompt = _prompt.Prompt
 from . import property as _property
@@ -3,19 +3,28 @@ import logging
 from .base_client import BaseClient
 from .openai_client import OpenAIClient
 from .null_client import NullClient
+from .registry import CLIENT_REGISTRY
 from ...error.bot import BotClientNotExistError
 
 BOT_CLIENTS = [OpenAIClient, NullClient]
 
-def get_bot_client(name : str, config : dict, logger : Optional[logging.Logger] = None) -> BaseClient:
+def get_bot_client(name : str, config : dict, logger : Optional[logging.Logger] = None, cached : bool = True) -> BaseClient:
     """
     Retrieve a bot client by its name and configuration.
 
     :param name: The bot client name.
     :param config: The bot client configuration.
     :param logger: Optional logger.
+    :param cached: Reuse the client previously created with the same configuration and logger.
     """
     for client in BOT_CLIENTS:
         if client.name() == name:
+            if cached: return CLIENT_REGISTRY.get(client, config, logger)
             return client(logger=logger, **config)
-    raise BotClientNotExistError("bot client '%s' does not exist" % name)
\ No newline at end of file
+    raise BotClientNotExistError("bot client '%s' does not exist" % name)
+
+def close_bot_clients():
+    """
+    Close the cached bot clients and their shared connection pools, this happens automatically at exit.
+    """
+    CLIENT_REGISTRY.close()
\ No newline at end of file
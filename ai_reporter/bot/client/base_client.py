@@ -1,17 +1,50 @@
 from abc import abstractmethod
+import asyncio
 import logging
-from typing import Optional
+import threading
+from typing import Optional, Union
 
+from ..image import ImagePipeline
 from ..prompt import Prompt
 from ..results import BotResults
+from ..token_count import TokenCount
+from ..tools.executor import DEFAULT_MAX_WORKERS
 from ..tools.handler import ToolHandler
 from ..tools.response import ToolDoneResponse
 from ...error.bot import MalformedBotResponseError
+from ...utils import check_config_type
+from .compaction import CompactionPolicy, DefaultCompactionPolicy
 
 class BaseClient:
 
-    def __init__(self, logger : Optional[logging.Logger] = None, **kwargs):
+    def __init__(
+        self,
+        logger : Optional[logging.Logger] = None,
+        warm_up : bool = False,
+        max_tool_workers : int = DEFAULT_MAX_WORKERS,
+        compaction : Union[dict, CompactionPolicy, None] = None,
+        images : dict = {},
+        **kwargs
+    ):
+        """
+        :param logger: Optional logger.
+        :param warm_up: Prepare the tools (clone repositories, build indexes) in the background while waiting for the first response.
+        :param max_tool_workers: The maximum number of tool calls from a single response to run concurrently.
+        :param compaction: Compact long conversations, either the options of the default compaction policy or a policy instance.
+        :param images: Options of the image pipeline that scales, re-encodes and deduplicates images sent to the bot.
+        """
+        check_config_type(warm_up, bool, "config:warm_up")
+        check_config_type(max_tool_workers, int, "config:max_tool_workers")
+        if compaction is not None: check_config_type(compaction, (dict, CompactionPolicy), "config:compaction")
+        check_config_type(images, dict, "config:images")
+        # check the image options early, each conversation gets its own pipeline
+        ImagePipeline(**images)
+        self.image_options = images
         self.logger = logger
+        self.warm_up = warm_up
+        self.max_tool_workers = max_tool_workers
+        self.compaction : CompactionPolicy = DefaultCompactionPolicy(**compaction) if isinstance(compaction, dict) else \
+            compaction if compaction else CompactionPolicy()
         self._kwargs = kwargs
 
     def _log(self, message : str, params : dict, level : int = logging.INFO):
@@ -26,12 +59,27 @@ class BaseClient:
         ...
 
     @abstractmethod
-    def run(self, prompt : Prompt) -> BotResults:
+    def run(self, prompt : Prompt, chain_tokens : int = 0) -> BotResults:
         """
         Submit the prompt the AI/LLM and return the results.
         
         :param prompt: The prompt.
+        :param chain_tokens: Tokens used by the previous reports of a report chain, counted against the prompt's chain token budget.
+        """
+        ...
+
+    async def run_async(self, prompt : Prompt, chain_tokens : int = 0) -> BotResults:
         """
+        Submit the prompt the AI/LLM and return the results without blocking the event loop.
+        Runs `run` in the default executor unless the client has a native async implementation.
+
+        :param prompt: The prompt.
+        :param chain_tokens: Tokens used by the previous reports of a report chain, counted against the prompt's chain token budget.
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, self.run, prompt, chain_tokens)
+
+    def close(self):
+        """ Release the resources held by the client. """
         ...
 
     def __str__(self):
@@ -43,6 +91,39 @@ class BaseClient:
             "done": {"properties": prompt.report_properties}
         }, self.logger)
 
+    def _start_warm_up(self, tool_handler : ToolHandler) -> Optional[threading.Thread]:
+        """ Warm up the tools in a background thread so it overlaps with the first chat completion. """
+        if not self.warm_up: return None
+        thread = threading.Thread(target=tool_handler.warm_up, name="ai-reporter-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _compact(self, messages : list, protected : int, token_counts : TokenCount, policy : Optional[CompactionPolicy] = None):
+        """
+        Compact the conversation before a request to the bot and count the tokens saved by the request.
+        Without a policy everything removed so far is counted, as none of it is sent again. A policy overrides the
+        configured one for an extra pass before the same request, only the tokens that pass removes are added.
+        """
+        removed = (policy or self.compaction).compact(messages, protected)
+        if removed:
+            token_counts.removed += removed
+            self._log("Compacted conversation, removed about %d tokens." % removed, {
+                "action": "compact", "object": self, "bot_tokens_removed": removed})
+        # everything removed so far is not sent again with this request
+        if not policy: token_counts.saved += token_counts.removed
+        else: token_counts.saved += removed
+
+    @staticmethod
+    def _remaining_token_budget(prompt : Prompt, token_counts : TokenCount, chain_tokens : int = 0) -> Optional[int]:
+        """ The number of tokens left in the report and chain token budgets, None if there is no budget. """
+        used = token_counts.input + token_counts.output + token_counts.hedged
+        out = None
+        if prompt.token_budget: out = prompt.token_budget - used
+        if prompt.chain_token_budget:
+            chain_remaining = prompt.chain_token_budget - chain_tokens - used
+            out = chain_remaining if out is None else min(out, chain_remaining)
+        return out
+
     def _log_start(self, prompt : Prompt):
         self._log("Start %s." % self.name(), {
             "action": "start", "object": self, "bot_prompt": prompt.to_dict()})
@@ -54,6 +135,14 @@ class BaseClient:
         self._log("Bot has reached maximum allowed iterations. Asking it to complete analysis.", {
             "action": "max interations", "object": self, "bot_iteration": iteration})
 
+    def _log_token_budget(self, iteration : int):
+        self._log("Bot is about to exceed its token budget. Asking it to complete analysis.", {
+            "action": "token budget", "object": self, "bot_iteration": iteration})
+
+    def _log_escalation(self, model : str, reason : str, iteration : int):
+        self._log("Escalate to model '%s' after bot %s." % (model, reason), {
+            "action": "escalate", "object": self, "bot_model": model, "bot_escalation": reason, "bot_iteration": iteration})
+
     def _log_error_retry(self, e : MalformedBotResponseError, retry_no : int):
         self._log("Retry #%d after '%s' error." % (retry_no, e.__class__.__name__), {
             "action": "retry", "object": self, "error_class": e.__class__.__name__, 
@@ -0,0 +1,106 @@
+from typing import Optional
+
+from ...utils import check_config_type
+from ..token_estimate import estimate_message_tokens, estimate_tokens
+
+DEFAULT_TOKEN_BUDGET = 32000
+DEFAULT_KEEP_SCREENSHOTS = 1
+DEFAULT_KEEP_TOOL_OUTPUTS = 6
+DEFAULT_MAX_TOOL_OUTPUT_SIZE = 1024
+
+SCREENSHOT_ELIDED_MESSAGE = "(an earlier screenshot was removed to save space)"
+
+class CompactionPolicy:
+
+    """
+    Reduces the size of the conversation sent to the bot on every iteration.
+    Subclass and pass an instance as the `compaction` client option to customize compaction.
+    """
+
+    def compact(self, messages : list[dict], protected : int = 0) -> int:
+        """
+        Compact the messages in place and return the estimated number of tokens removed.
+
+        :param messages: The conversation so far.
+        :param protected: Number of messages at the start of the conversation that must not change (the prompt).
+        """
+        return 0
+
+class DefaultCompactionPolicy(CompactionPolicy):
+
+    """
+    Once the conversation is over the token budget, removes old screenshots and replaces large old tool
+    outputs with a short reference, oldest first, until the conversation is within the budget again.
+    Tool calls are kept so the bot knows what it already looked at and can call a tool again if needed.
+    """
+
+    def __init__(
+        self,
+        token_budget : int = DEFAULT_TOKEN_BUDGET,
+        keep_screenshots : int = DEFAULT_KEEP_SCREENSHOTS,
+        keep_tool_outputs : int = DEFAULT_KEEP_TOOL_OUTPUTS,
+        max_tool_output_size : int = DEFAULT_MAX_TOOL_OUTPUT_SIZE
+    ):
+        """
+        :param token_budget: Compact the conversation when its estimated size is over this number of tokens.
+        :param keep_screenshots: The number of most recent screenshots to always keep.
+        :param keep_tool_outputs: The number of most recent tool outputs to always keep.
+        :param max_tool_output_size: Older tool outputs up to this number of characters are kept.
+        """
+        check_config_type(token_budget, int, "config:compaction.token_budget")
+        check_config_type(keep_screenshots, int, "config:compaction.keep_screenshots")
+        check_config_type(keep_tool_outputs, int, "config:compaction.keep_tool_outputs")
+        check_config_type(max_tool_output_size, int, "config:compaction.max_tool_output_size")
+        self.token_budget = token_budget
+        self.keep_screenshots = keep_screenshots
+        self.keep_tool_outputs = keep_tool_outputs
+        self.max_tool_output_size = max_tool_output_size
+
+    def compact(self, messages : list[dict], protected : int = 0) -> int:
+        tokens = estimate_tokens(messages)
+        if tokens <= self.token_budget: return 0
+        saved = 0
+        screenshots = [i for i in range(protected, len(messages)) if self._is_screenshot(messages[i])]
+        tool_outputs = [i for i in range(protected, len(messages)) if self._is_large_tool_output(messages[i])]
+        candidates = sorted(
+            screenshots[:max(len(screenshots) - self.keep_screenshots, 0)] +
+            tool_outputs[:max(len(tool_outputs) - self.keep_tool_outputs, 0)]
+        )
+        tool_calls = self._tool_calls(messages)
+        for i in candidates:
+            if tokens - saved <= self.token_budget: break
+            before = estimate_message_tokens(messages[i])
+            if messages[i].get("role") == "tool":
+                messages[i] = {**messages[i], "content": self._tool_output_reference(messages[i], tool_calls.get(messages[i].get("tool_call_id", "")))}
+            else:
+                messages[i] = {**messages[i], "content": SCREENSHOT_ELIDED_MESSAGE}
+            saved += before - estimate_message_tokens(messages[i])
+        return saved
+
+    def _is_screenshot(self, message : dict) -> bool:
+        content = message.get("content")
+        return message.get("role") == "user" and isinstance(content, list) and \
+            any(map(lambda p: p.get("type") == "image_url", content))
+
+    def _is_large_tool_output(self, message : dict) -> bool:
+        content = message.get("content")
+        return message.get("role") == "tool" and isinstance(content, str) and len(content) > self.max_tool_output_size
+
+    @staticmethod
+    def _tool_calls(messages : list[dict]) -> dict[str,dict]:
+        """ Map of tool call ids to the function (name and arguments) that was called. """
+        out = {}
+        for message in messages:
+            for tool_call in message.get("tool_calls") or []:
+                out[tool_call.get("id", "")] = tool_call.get("function", {})
+        return out
+
+    @staticmethod
+    def _tool_output_reference(message : dict, function : Optional[dict]) -> str:
+        content : str = message.get("content", "")
+        lines = content.splitlines()
+        # keep the header of file dumps ("FILE: ..." and "LINES: ...") so the bot knows what it read
+        header = "\n".join(lines[:2]) if content.startswith("FILE: ") else lines[0][:200] if lines else ""
+        call = "'%s' call with arguments %s" % (function.get("name"), function.get("arguments")) if function else "tool call"
+        return "%s\n(output of this %s was removed to save space, %d characters, call the tool again if you need it)" % (
+            header, call, len(content))
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+from openai.types.chat import ChatCompletion
+
+from ...error.bot import CompletionCacheMissError
+from ...error.config import ConfigParameterValueError
+from ..tools.base import WORK_PATH
+
+CACHE_MODE_READ_THROUGH = "read-through"
+CACHE_MODE_RECORD = "record"
+CACHE_MODE_REPLAY = "replay"
+CACHE_MODES = [CACHE_MODE_READ_THROUGH, CACHE_MODE_RECORD, CACHE_MODE_REPLAY]
+
+DEFAULT_CACHE_PATH = os.path.join(WORK_PATH, "completions")
+DEFAULT_CACHE_SIZE = 268435456 # 256MB
+
+class CompletionCache:
+
+    """
+    On-disk cache of chat completion responses keyed by a hash of the request (model, messages, tool definitions
+    and sampling parameters). Since tool call ids of cached responses are replayed too, a whole conversation
+    replays from the cache as long as the tools return the same results.
+
+    Modes:
+    - read-through: return cached responses, request and store missing ones
+    - record: always request and store the response
+    - replay: only return cached responses, a missing response is an error
+    """
+
+    def __init__(self, mode : str = CACHE_MODE_READ_THROUGH, path : str = DEFAULT_CACHE_PATH, max_size : int = DEFAULT_CACHE_SIZE):
+        """
+        :param mode: The cache mode, one of 'read-through', 'record' or 'replay'.
+        :param path: The directory to store responses in.
+        :param max_size: The maximum total size of the cache in bytes, least recently used responses are removed first.
+        """
+        if mode not in CACHE_MODES:
+            raise ConfigParameterValueError("invalid completion cache mode '%s', expected one of %s" % (mode, ", ".join(CACHE_MODES)))
+        self.mode = mode
+        self.path = path
+        self.max_size = max_size
+        self._size : Optional[int] = None
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def key(params : dict) -> str:
+        """
+        Get the cache key of a chat completion request.
+
+        :param params: The chat completion request parameters.
+        """
+        data = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def get(self, key : str) -> Optional[ChatCompletion]:
+        """
+        Get a cached response, always None in record mode.
+
+        :param key: The cache key.
+        """
+        if self.mode == CACHE_MODE_RECORD: return None
+        path = self._response_path(key)
+        try:
+            with open(path, "r") as f: response = ChatCompletion.model_validate_json(f.read())
+        except FileNotFoundError:
+            if self.mode == CACHE_MODE_REPLAY: raise CompletionCacheMissError("no cached chat completion for request '%s'" % key)
+            return None
+        # the modification time tracks the last use for eviction
+        try: os.utime(path)
+        except OSError: pass
+        return response
+
+    def put(self, key : str, response : ChatCompletion):
+        """
+        Store a response, does nothing in replay mode.
+
+        :param key: The cache key.
+        :param response: The chat completion response.
+        """
+        if self.mode == CACHE_MODE_REPLAY: return
+        path = self._response_path(key)
+        # unset fields are left out so replayed messages serialize exactly like the original response
+        data = response.model_dump_json(exclude_unset=True)
+        tmp_path = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+        with open(tmp_path, "w") as f: f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._size is None: self._size = self._dir_size()
+            else: self._size += len(data)
+            if self._size > self.max_size: self._evict()
+
+    def _evict(self):
+        """ Remove the least recently used responses until the cache is within its size limit. """
+        files = []
+        for dirpath, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                if not filename.endswith(".json"): continue
+                try: stat = os.stat(os.path.join(dirpath, filename))
+                except FileNotFoundError: continue
+                files.append((stat.st_mtime, stat.st_size, os.path.join(dirpath, filename)))
+        files.sort()
+        self._size = sum(map(lambda f: f[1], files))
+        for _, size, path in files:
+            if self._size <= self.max_size: break
+            try: os.remove(path)
+            except FileNotFoundError: pass
+            self._size -= size
+
+    def _dir_size(self) -> int:
+        size = 0
+        for dirpath, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                try: size += os.path.getsize(os.path.join(dirpath, filename))
+                except FileNotFoundError: pass
+        return size
+
+    def _response_path(self, key : str) -> str:
+        path = os.path.join(self.path, key[:2], "%s.json" % key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
@@ -0,0 +1,103 @@
+from collections import deque
+import math
+import threading
+from typing import Optional
+
+from ...error.config import ConfigParameterValueError
+from ...utils import check_config_type
+
+DEFAULT_PERCENTILE = 95.0
+DEFAULT_MIN_DELAY = 2.0
+DEFAULT_MAX_DELAY = 60.0
+DEFAULT_INITIAL_DELAY = 20.0 # used until enough latencies were observed
+DEFAULT_MIN_SAMPLES = 20
+LATENCY_SAMPLES = 200
+
+class LatencyTracker:
+
+    """ Recent chat completion latencies of a model, used to pick the delay before hedging a request. """
+
+    def __init__(self, size : int = LATENCY_SAMPLES):
+        """
+        :param size: The number of most recent latencies to keep.
+        """
+        self._latencies : deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds : float):
+        """
+        Record the latency of a successful request.
+
+        :param seconds: The latency in seconds.
+        """
+        with self._lock: self._latencies.append(seconds)
+
+    def percentile(self, percentile : float, min_samples : int = 1) -> Optional[float]:
+        """
+        The latency percentile in seconds, None if fewer latencies were recorded than required.
+
+        :param percentile: The percentile, between 0 and 100.
+        :param min_samples: The minimum number of recorded latencies.
+        """
+        with self._lock: latencies = sorted(self._latencies)
+        if not latencies or len(latencies) < min_samples: return None
+        # nearest rank percentile
+        return latencies[min(max(math.ceil(len(latencies) * percentile / 100) - 1, 0), len(latencies) - 1)]
+
+class HedgingPolicy:
+
+    """
+    Sends a duplicate of a chat completion request that takes longer than usual and uses whichever response
+    arrives first. The delay before hedging is a high percentile of the recently observed latencies of the
+    model, so only the slowest requests are duplicated.
+    """
+
+    def __init__(
+        self,
+        percentile : float = DEFAULT_PERCENTILE,
+        min_delay : float = DEFAULT_MIN_DELAY,
+        max_delay : float = DEFAULT_MAX_DELAY,
+        initial_delay : float = DEFAULT_INITIAL_DELAY,
+        min_samples : int = DEFAULT_MIN_SAMPLES
+    ):
+        """
+        :param percentile: Hedge requests that take longer than this percentile of the observed latencies.
+        :param min_delay: The minimum number of seconds to wait before hedging.
+        :param max_delay: The maximum number of seconds to wait before hedging.
+        :param initial_delay: The number of seconds to wait before hedging until enough latencies were observed.
+        :param min_samples: The number of observed latencies needed before the percentile is used.
+        """
+        check_config_type(percentile, (int, float), "config:hedging.percentile")
+        check_config_type(min_delay, (int, float), "config:hedging.min_delay")
+        check_config_type(max_delay, (int, float), "config:hedging.max_delay")
+        check_config_type(initial_delay, (int, float), "config:hedging.initial_delay")
+        check_config_type(min_samples, int, "config:hedging.min_samples")
+        if not 0 < percentile <= 100:
+            raise ConfigParameterValueError("invalid hedging percentile '%s', expected a number between 0 and 100" % percentile)
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+
+    def delay(self, latencies : LatencyTracker) -> float:
+        """
+        The number of seconds to wait for a response before sending a duplicate request.
+
+        :param latencies: The observed latencies of the model.
+        """
+        latency = latencies.percentile(self.percentile, self.min_samples)
+        return min(max(latency if latency is not None else self.initial_delay, self.min_delay), self.max_delay)
+
+_latency_trackers : dict[tuple[str,str],LatencyTracker] = {}
+_latency_trackers_lock = threading.Lock()
+
+def get_latency_tracker(base_url : str, model : str) -> LatencyTracker:
+    """
+    Get the process wide latency tracker of an API and model.
+
+    :param base_url: The API URL.
+    :param model: The model.
+    """
+    with _latency_trackers_lock:
+        return _latency_trackers.setdefault((base_url, model), LatencyTracker())
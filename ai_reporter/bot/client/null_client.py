@@ -12,7 +12,7 @@ class NullClient(BaseClient):
     def name():
         return "null"
 
-    def run(self, prompt : Prompt) -> BotResults:
+    def run(self, prompt : Prompt, chain_tokens : int = 0) -> BotResults:
         self._log_start(prompt)
         self._log_iteration(1)
         tool_response = ToolDoneResponse(test=True, null=True, prompt=prompt.to_dict())
@@ -1,9 +1,15 @@
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 import json
 import logging
-from typing import Iterable, Optional, Tuple
+import threading
+import time
+import weakref
+from typing import Generator, Iterable, Optional, Tuple, Union
 
 import openai
 from openai.types.chat import (
+    ChatCompletion,
     ChatCompletionContentPartImageParam,
     ChatCompletionMessageParam,
     ChatCompletionMessageToolCall,
@@ -15,15 +21,35 @@ from openai.types.chat import (
 from openai.types.chat.chat_completion_content_part_image_param import ImageURL
 from openai.types.shared_params.function_definition import FunctionDefinition
 
-from ...error.bot import BotMaxIterationsError, MalformedBotResponseError
+from ...error.bot import BotMaxIterationsError, BotTokenBudgetError, MalformedBotResponseError
+from ...error.config import ConfigParameterValueError
 from ...utils import check_config_type
-from ..image import Image
+from ..image import Image, ImagePipeline
 from ..prompt import Prompt
+from ..property import PropertyDefinition, PropertyType
 from ..results import BotResults
+from ..routing import ModelRouter
+from ..tools.done import DoneTool
+from ..tools.executor import ToolExecutor
 from ..tools.handler import ToolHandler
 from ..tools.response import ToolDoneResponse, ToolMessageResponse, ToolResponseBase
 from .base_client import BaseClient
+from .compaction import DefaultCompactionPolicy
+from .completion_cache import DEFAULT_CACHE_PATH, DEFAULT_CACHE_SIZE, CompletionCache
+from .hedging import HedgingPolicy, LatencyTracker, get_latency_tracker
+from .registry import CLIENT_REGISTRY
+from .rate_limit import DEFAULT_MAX_RETRIES, RateLimiter, RetryPolicy, get_rate_limiter
+from .stream import StreamAccumulator
 from ..token_count import TokenCount
+from ..token_estimate import estimate_text_tokens, estimate_tokens
+
+STEP_COMPLETION = "completion"
+STEP_TOOL_CALLS = "tool_calls"
+STREAM_PARAMS = {"stream": True, "stream_options": {"include_usage": True}}
+RESPONSE_TOKENS = 1024 # room left for the response when checking the token budget
+
+# unused hedged requests of the sync client finish and are counted in background threads
+_hedged_tokens_lock = threading.Lock()
 
 class OpenAIClient(BaseClient):
 
@@ -31,56 +57,348 @@ class OpenAIClient(BaseClient):
     Bot client for OpenAI (gpt-4) and other other OpenAI compatible APIs that support function calling.
     """
 
-    def __init__(self, api_key : Optional[str] = None, base_url : Optional[str] = None, **kwargs):
+    def __init__(
+        self,
+        api_key : Optional[str] = None,
+        base_url : Optional[str] = None,
+        completion_cache : Optional[str] = None,
+        completion_cache_path : str = DEFAULT_CACHE_PATH,
+        completion_cache_size : int = DEFAULT_CACHE_SIZE,
+        max_retries : int = DEFAULT_MAX_RETRIES,
+        requests_per_minute : int = 0,
+        tokens_per_minute : int = 0,
+        stream : bool = False,
+        hedging : Union[dict, HedgingPolicy, None] = None,
+        **kwargs
+    ):
+        """
+        :param api_key: The OpenAI API key, read from the environment if not provided.
+        :param base_url: The URL of an OpenAI compatible API.
+        :param completion_cache: Cache chat completions on disk, one of 'read-through', 'record' or 'replay'. Disabled if not provided.
+        :param completion_cache_path: The directory to store cached chat completions in.
+        :param completion_cache_size: The maximum size of the completion cache in bytes.
+        :param max_retries: The maximum number of retries of a chat completion after rate limit, server or connection errors.
+        :param requests_per_minute: Requests per minute limit shared by all clients of the process using the same API and model, unlimited if zero.
+        :param tokens_per_minute: Tokens per minute limit shared by all clients of the process using the same API and model, unlimited if zero.
+        :param stream: Stream chat completions and start each tool call as soon as its arguments are complete, the API must support usage in streams.
+        :param hedging: Send a duplicate request when a chat completion takes longer than usual, either the options of the hedging policy or a policy instance.
+        """
         super().__init__(**kwargs)
         if api_key: check_config_type(api_key, str, "config:api_key")
         if base_url: check_config_type(base_url, str, "config:base_url")
+        if completion_cache: check_config_type(completion_cache, str, "config:completion_cache")
+        check_config_type(completion_cache_path, str, "config:completion_cache_path")
+        check_config_type(completion_cache_size, int, "config:completion_cache_size")
+        self.api_key = api_key
+        self.base_url = base_url
+        self.completion_cache = CompletionCache(completion_cache, completion_cache_path, completion_cache_size) if completion_cache else None
+        check_config_type(requests_per_minute, int, "config:requests_per_minute")
+        check_config_type(tokens_per_minute, int, "config:tokens_per_minute")
+        check_config_type(stream, bool, "config:stream")
+        if hedging is not None: check_config_type(hedging, (dict, HedgingPolicy), "config:hedging")
+        # tool calls are started while streaming, they would run twice with a duplicate request
+        if stream and hedging is not None: raise ConfigParameterValueError("hedging can't be used with streaming")
+        self.retry_policy = RetryPolicy(max_retries)
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.stream = stream
+        self.hedging : Optional[HedgingPolicy] = HedgingPolicy(**hedging) if isinstance(hedging, dict) else hedging
+        # retries are handled by the retry policy so they are coordinated with the rate limiter
         self.client = openai.OpenAI(
             api_key=api_key,
-            base_url=base_url
+            base_url=base_url,
+            max_retries=0,
+            http_client=CLIENT_REGISTRY.http_client()
         )
+        self._async_clients : weakref.WeakKeyDictionary[asyncio.AbstractEventLoop,openai.AsyncOpenAI] = weakref.WeakKeyDictionary()
+
+    @property
+    def async_client(self) -> openai.AsyncOpenAI:
+        """ Client for the async API in the running event loop, created on first use. """
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            self._async_clients[loop] = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=0,
+                http_client=CLIENT_REGISTRY.async_http_client()
+            )
+        return self._async_clients[loop]
+
+    def close(self):
+        # the connection pools are shared, they are closed by the client registry
+        self._async_clients.clear()
 
     @staticmethod
     def name():
         return "openai"
 
-    def _prepare_image_attachments(self, images : Iterable[Image]) -> ChatCompletionUserMessageParam:
+    def _prepare_image_attachments(self, images : Iterable[Image], image_pipeline : ImagePipeline) -> ChatCompletionUserMessageParam:
         messages = []
         # TODO preface attachments with information about what they are?
         #messages.append({ "type": "text", 
         #    "text": "The following are images (they should be screenshots of the application) that have been attached to the issue." })
         for image in images:
-            data = image.to_base64()
+            data = image_pipeline.process(image).to_base64()
             if not data: raise ValueError("cannot process image with no data")
             messages.append(
                 ChatCompletionContentPartImageParam(
-                    image_url=ImageURL(url=data, detail="high"),
+                    image_url=ImageURL(url=data, detail=image_pipeline.detail),
                     type="image_url"
                 )
             )
         return ChatCompletionUserMessageParam(role="user", content=messages)
 
-    def run(self, prompt : Prompt) -> BotResults:
+    def run(self, prompt : Prompt, chain_tokens : int = 0) -> BotResults:
+        steps = self._run_steps(prompt, chain_tokens)
+        result, error = None, None
+        while True:
+            try: step = steps.throw(error) if error else steps.send(result)
+            except StopIteration as e: return e.value
+            result, error = None, None
+            try:
+                if step[0] == STEP_COMPLETION: result = self._create_completion(*step[1])
+                elif step[0] == STEP_TOOL_CALLS: result = self._tool_calls(*step[1])
+            except Exception as e: error = e
+
+    async def run_async(self, prompt : Prompt, chain_tokens : int = 0) -> BotResults:
+        steps = self._run_steps(prompt, chain_tokens)
+        loop = asyncio.get_running_loop()
+        result, error = None, None
+        while True:
+            try: step = steps.throw(error) if error else steps.send(result)
+            except StopIteration as e: return e.value
+            result, error = None, None
+            try:
+                if step[0] == STEP_COMPLETION: result = await self._create_completion_async(*step[1])
+                # tools block on git and selenium, run them in the executor to keep the event loop free
+                elif step[0] == STEP_TOOL_CALLS: result = await loop.run_in_executor(None, self._tool_calls, *step[1])
+            except Exception as e: error = e
+
+    def _create_completion(
+        self,
+        params : dict,
+        executor : Optional[ToolExecutor] = None,
+        token_counts : Optional[TokenCount] = None
+    ) -> ChatCompletion:
+        """ Request a chat completion, when streaming the tool calls are started with the executor as they arrive. """
+        cache_key = CompletionCache.key(params) if self.completion_cache else ""
+        response = self.completion_cache.get(cache_key) if self.completion_cache else None
+        if response: return response
+        rate_limiter = self._rate_limiter(params["model"])
+        tokens = self._estimate_request_tokens(params)
+        attempt = 0
+        while True:
+            rate_limiter.acquire(tokens)
+            accumulator = self._stream_accumulator(executor)
+            try:
+                if not self.stream:
+                    response = self._create_hedged(params, rate_limiter, tokens, token_counts) if self.hedging else \
+                        self.client.chat.completions.create(**params)
+                    break
+                for chunk in self.client.chat.completions.create(**params, **STREAM_PARAMS): accumulator.add(chunk)
+                response = accumulator.finish()
+                break
+            except openai.OpenAIError as e:
+                # started tool calls can't be undone, the response can't be requested again
+                if accumulator.dispatched: raise e
+                delay = self._retry_delay(e, attempt, rate_limiter, tokens)
+                attempt += 1
+                time.sleep(delay)
+        rate_limiter.adjust(tokens, response.usage.total_tokens if response.usage else tokens)
+        if self.completion_cache: self.completion_cache.put(cache_key, response)
+        return response
+
+    async def _create_completion_async(
+        self,
+        params : dict,
+        executor : Optional[ToolExecutor] = None,
+        token_counts : Optional[TokenCount] = None
+    ) -> ChatCompletion:
+        cache_key = CompletionCache.key(params) if self.completion_cache else ""
+        response = self.completion_cache.get(cache_key) if self.completion_cache else None
+        if response: return response
+        rate_limiter = self._rate_limiter(params["model"])
+        tokens = self._estimate_request_tokens(params)
+        attempt = 0
+        while True:
+            await rate_limiter.acquire_async(tokens)
+            accumulator = self._stream_accumulator(executor)
+            try:
+                if not self.stream:
+                    response = await self._create_hedged_async(params, rate_limiter, tokens, token_counts) if self.hedging else \
+                        await self.async_client.chat.completions.create(**params)
+                    break
+                async for chunk in await self.async_client.chat.completions.create(**params, **STREAM_PARAMS): accumulator.add(chunk)
+                response = accumulator.finish()
+                break
+            except openai.OpenAIError as e:
+                if accumulator.dispatched: raise e
+                delay = self._retry_delay(e, attempt, rate_limiter, tokens)
+                attempt += 1
+                await asyncio.sleep(delay)
+        rate_limiter.adjust(tokens, response.usage.total_tokens if response.usage else tokens)
+        if self.completion_cache: self.completion_cache.put(cache_key, response)
+        return response
+
+    def _create_hedged(self, params : dict, rate_limiter : RateLimiter, tokens : int, token_counts : Optional[TokenCount]) -> ChatCompletion:
+        """ Request a chat completion, send a duplicate request if the response takes longer than usual and use the first response. """
+        latencies = get_latency_tracker(self.base_url or "", params["model"])
+        delay = self.hedging.delay(latencies)
+        # the sync client can't interrupt a request, the unused request finishes in the background
+        pool = ThreadPoolExecutor(max_workers=2)
+        try:
+            requests = [pool.submit(self._timed_create, params, latencies)]
+            if not wait(requests, timeout=delay).done and rate_limiter.try_acquire(tokens):
+                self._log_hedge(params["model"], delay)
+                requests.append(pool.submit(self._timed_create, params, latencies))
+            pending = set(requests)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                winner = next(filter(lambda f: f in done and not f.exception(), requests), None)
+                if winner:
+                    self._count_hedge_losers(list(filter(lambda f: f is not winner, requests)), rate_limiter, tokens, token_counts)
+                    return winner.result()
+            self._count_hedge_losers(requests[1:], rate_limiter, tokens, token_counts)
+            raise requests[0].exception()
+        finally: pool.shutdown(wait=False)
+
+    async def _create_hedged_async(self, params : dict, rate_limiter : RateLimiter, tokens : int, token_counts : Optional[TokenCount]) -> ChatCompletion:
+        latencies = get_latency_tracker(self.base_url or "", params["model"])
+        delay = self.hedging.delay(latencies)
+        requests = [asyncio.ensure_future(self._timed_create_async(params, latencies))]
+        try:
+            if not (await asyncio.wait(requests, timeout=delay))[0] and rate_limiter.try_acquire(tokens):
+                self._log_hedge(params["model"], delay)
+                requests.append(asyncio.ensure_future(self._timed_create_async(params, latencies)))
+            pending = set(requests)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next(filter(lambda t: t in done and not t.exception(), requests), None)
+                if winner:
+                    self._count_hedge_losers(list(filter(lambda t: t is not winner, requests)), rate_limiter, tokens, token_counts)
+                    return winner.result()
+            self._count_hedge_losers(requests[1:], rate_limiter, tokens, token_counts)
+            raise requests[0].exception()
+        # cancelling a request closes its connection so the API stops generating the response
+        finally:
+            for request in requests: request.cancel()
+
+    def _timed_create(self, params : dict, latencies : LatencyTracker) -> ChatCompletion:
+        start = time.monotonic()
+        out = self.client.chat.completions.create(**params)
+        latencies.record(time.monotonic() - start)
+        return out
+
+    async def _timed_create_async(self, params : dict, latencies : LatencyTracker) -> ChatCompletion:
+        start = time.monotonic()
+        out = await self.async_client.chat.completions.create(**params)
+        latencies.record(time.monotonic() - start)
+        return out
+
+    @staticmethod
+    def _count_hedge_losers(
+        losers : list[Union[Future, asyncio.Future]],
+        rate_limiter : RateLimiter,
+        tokens : int,
+        token_counts : Optional[TokenCount]
+    ):
+        """
+        Count the tokens of hedged requests whose response isn't used. Sync requests can't be interrupted, their actual
+        usage is counted once they finish. Cancelled async requests have no usage, the API bills the prompt so their
+        estimated input tokens are counted.
+        """
+        def count(loser : Union[Future, asyncio.Future]):
+            used = max(tokens - RESPONSE_TOKENS, 0)
+            if loser.done() and not loser.cancelled():
+                if loser.exception(): used = 0
+                elif loser.result().usage: used = loser.result().usage.total_tokens
+            rate_limiter.adjust(tokens, used)
+            if not token_counts: return
+            with _hedged_tokens_lock: token_counts.hedged += used
+        for loser in losers:
+            if isinstance(loser, Future) and not loser.done(): loser.add_done_callback(count)
+            else: count(loser)
+
+    def _log_hedge(self, model : str, delay : float):
+        self._log("Hedge chat completion with a duplicate request after %.1f seconds." % delay, {
+            "action": "hedge", "object": self, "bot_model": model, "bot_hedge_delay": delay})
+
+    @staticmethod
+    def _stream_accumulator(executor : Optional[ToolExecutor]) -> StreamAccumulator:
+        # calls would run inline and hold up reading the stream without a thread pool
+        if not executor or executor.max_workers <= 1: return StreamAccumulator()
+        return StreamAccumulator(lambda call_id, name, args: executor.submit(call_id, name, args))
+
+    def _retry_delay(self, error : openai.OpenAIError, attempt : int, rate_limiter : RateLimiter, tokens : int) -> float:
+        """ The delay before retrying a failed request, raises the error if it shouldn't be retried. """
+        # the failed request didn't use its reserved tokens
+        rate_limiter.adjust(tokens, 0)
+        if not self.retry_policy.should_retry(error, attempt): raise error
+        delay = self.retry_policy.delay(error, attempt)
+        # other requests would hit the rate limit too, hold them back as well
+        if isinstance(error, openai.RateLimitError): rate_limiter.pause(delay)
+        self._log("Retry chat completion in %.1f seconds after '%s' error." % (delay, error.__class__.__name__), {
+            "action": "retry", "object": self, "error_class": error.__class__.__name__, "error": str(error),
+            "bot_retry_delay": delay, "bot_retry": attempt + 1}, level=logging.WARNING)
+        return delay
+
+    def _rate_limiter(self, model : str) -> RateLimiter:
+        return get_rate_limiter(self.base_url or "", model, self.requests_per_minute, self.tokens_per_minute)
+
+    @staticmethod
+    def _estimate_request_tokens(params : dict) -> int:
+        return estimate_tokens(params["messages"], params["model"]) + \
+            estimate_text_tokens(json.dumps(params.get("tools", [])), params["model"]) + RESPONSE_TOKENS
+
+    def _run_steps(self, prompt : Prompt, chain_tokens : int = 0) -> Generator[tuple[str,tuple], object, BotResults]:
+        """
+        The conversation with the bot as a generator so the same logic drives both the sync and async clients.
+        Yields the blocking steps (chat completions and tool calls) for the caller to run and send back the result.
+        """
+        # the tool calls of every response share a thread pool, its threads keep per thread state such as repository handles
+        tool_pool = ThreadPoolExecutor(max_workers=self.max_tool_workers, thread_name_prefix="ai-reporter-tool") \
+            if self.max_tool_workers > 1 else None
+        try: return (yield from self._conversation(prompt, chain_tokens, tool_pool))
+        finally:
+            if tool_pool: tool_pool.shutdown(wait=False)
 
+    def _conversation(
+        self,
+        prompt : Prompt,
+        chain_tokens : int,
+        tool_pool : Optional[ThreadPoolExecutor]
+    ) -> Generator[tuple[str,tuple], object, BotResults]:
         tool_handler = self._get_tool_handler(prompt)
+        self._start_warm_up(tool_handler)
         token_counts = TokenCount()
+        router = ModelRouter(prompt)
 
         # prepare initial messages for ai
         messages : list[ChatCompletionMessageParam] = [
             ChatCompletionSystemMessageParam(content=prompt.system_prompt, role="system"),
             ChatCompletionUserMessageParam(content=prompt.user_prompt, role="user")
         ]
-        if prompt.images: messages.append(self._prepare_image_attachments(prompt.images))
+        image_pipeline = ImagePipeline(**self.image_options)
+        if prompt.images: messages.append(self._prepare_image_attachments(prompt.images, image_pipeline))
+        prompt_size = len(messages)
 
         self._log_start(prompt)
 
+        # without tools the report only needs the values, get them with a single structured output request
+        if not prompt.tools:
+            return (yield from self._handle_structured_completion(
+                prompt, router.model(finishing=True), tool_handler, messages, prompt_size, token_counts, chain_tokens))
+
         # make iterations until bot/llm completes task or max iterations are reached
+        finishing = False
         for iteration in range(1, prompt.max_iterations+1):
             self._log_iteration(iteration)
 
             # after max iteration reached make only the 'done' tool available, and tell bot to finish its report
-            if iteration == prompt.max_iterations:
+            if iteration == prompt.max_iterations and not finishing:
                 self._log_max_iterations(iteration)
+                finishing = True
                 tool_handler = self._get_tool_handler(prompt, is_final_iteration=True)
                 messages.append({"role": "user", "content": prompt.max_iteration_prompt})
 
@@ -88,11 +406,27 @@ class OpenAIClient(BaseClient):
             tool_response = None
             err_retry_iter = prompt.max_error_retry
             while err_retry_iter >= 0:
+                self._compact(messages, prompt_size, token_counts)
+                # the next request would go over the token budget, force the bot to finish its report
+                if not self._fit_token_budget(prompt, tool_handler, messages, prompt_size, token_counts, chain_tokens):
+                    if finishing: raise BotTokenBudgetError("token budget exceeded")
+                    self._log_token_budget(iteration)
+                    finishing = True
+                    tool_handler = self._get_tool_handler(prompt, is_final_iteration=True)
+                    messages.append({"role": "user", "content": prompt.max_iteration_prompt})
+                    if not self._fit_token_budget(prompt, tool_handler, messages, prompt_size, token_counts, chain_tokens):
+                        raise BotTokenBudgetError("token budget exceeded")
                 try:
-                    chat_resp_messages, tool_response = self._handle_chat_completion(prompt.model, tool_handler, messages, token_counts)
+                    max_tokens = self._max_response_tokens(prompt, tool_handler, messages, token_counts, chain_tokens)
+                    chat_resp_messages, tool_response = yield from self._handle_chat_completion(
+                        router.model(finishing), tool_handler, messages, token_counts, image_pipeline, max_tokens, tool_pool)
                     messages += chat_resp_messages
                     err_retry_iter = -1
+                    escalation = router.response(chat_resp_messages[0]) if chat_resp_messages else None
+                    if escalation: self._log_escalation(router.model(), escalation, iteration)
                 except MalformedBotResponseError as e:
+                    escalation = router.error()
+                    if escalation: self._log_escalation(router.model(), escalation, iteration)
                     err_retry_iter -= 1
                     if err_retry_iter <= 0: raise e
                     messages.append(ChatCompletionUserMessageParam(content=e.retry_message(), role="user"))
@@ -108,31 +442,180 @@ class OpenAIClient(BaseClient):
         # failed to complete task, this should be unreachable code, the bot should be forced to call the `done` tool
         raise BotMaxIterationsError("max iterations reached")
 
+    def _handle_structured_completion(
+        self,
+        prompt : Prompt,
+        model : str,
+        tool_handler : ToolHandler,
+        messages : list[ChatCompletionMessageParam],
+        prompt_size : int,
+        token_counts : TokenCount,
+        chain_tokens : int
+    ) -> Generator[tuple[str,tuple], object, BotResults]:
+        """
+        Generate the report with a JSON schema structured output chat completion built from the report properties,
+        used when the prompt has no tools. The values are checked like the arguments of a 'done' tool call.
+        """
+        properties = DoneTool.properties(prompt.report_properties)
+        response_format = self._response_format(properties)
+        err_retry_iter = prompt.max_error_retry
+        while True:
+            # the schema has about the size of the 'done' tool definition
+            if not self._fit_token_budget(prompt, tool_handler, messages, prompt_size, token_counts, chain_tokens):
+                raise BotTokenBudgetError("token budget exceeded")
+            params = {
+                "messages": messages,
+                "model": model,
+                "temperature": 0.2,
+                "top_p": 0.1,
+                "response_format": response_format
+            }
+            max_tokens = self._max_response_tokens(prompt, tool_handler, messages, token_counts, chain_tokens)
+            if max_tokens is not None: params["max_completion_tokens"] = max_tokens
+            response : ChatCompletion = yield (STEP_COMPLETION, (params, None, token_counts))
+            if response.usage: token_counts.add(model, response.usage.prompt_tokens, response.usage.completion_tokens)
+            if len(response.choices) == 0: raise Exception("unexpected empty response from chat completitions api")
+            self._check_response_length(response, max_tokens)
+            response_message = response.choices[0].message
+            try:
+                values = self._parse_structured_response(response_message.content, properties)
+            except MalformedBotResponseError as e:
+                err_retry_iter -= 1
+                if err_retry_iter <= 0: raise e
+                messages.append(response_message.to_dict())
+                messages.append(ChatCompletionUserMessageParam(content=e.retry_message(), role="user"))
+                self._log_error_retry(e, prompt.max_error_retry - err_retry_iter)
+                continue
+            tool_response = ToolDoneResponse(**values)
+            tool_response.tool_name = DoneTool.name()
+            self._log_done(tool_response)
+            return BotResults(tool_response.values, token_counts)
+
+    @staticmethod
+    def _response_format(properties : list[PropertyDefinition]) -> dict:
+        schema_properties = {}
+        for prop in properties:
+            schema = prop.to_dict()
+            # strict schemas require every property, optional properties can be null instead
+            if not prop.required:
+                schema["type"] = [schema["type"], "null"]
+                if "enum" in schema: schema["enum"] = schema["enum"] + [None]
+            schema_properties[prop.name] = schema
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "report",
+                # strict schemas can't have objects with arbitrary keys
+                "strict": not any(map(lambda p: p.type == PropertyType.DICT, properties)),
+                "schema": {
+                    "type": "object",
+                    "properties": schema_properties,
+                    "required": list(schema_properties.keys()),
+                    "additionalProperties": False
+                }
+            }
+        }
+
+    @staticmethod
+    def _parse_structured_response(content : Optional[str], properties : list[PropertyDefinition]) -> dict:
+        try: values = json.loads(content or "")
+        except ValueError: raise MalformedBotResponseError("structured response is not valid JSON")
+        if not isinstance(values, dict): raise MalformedBotResponseError("structured response is not a JSON object")
+        ToolHandler.check_args(DoneTool.name(), properties, values)
+        return dict(filter(lambda v: v[1] is not None, values.items()))
+
+    def _fit_token_budget(
+        self,
+        prompt : Prompt,
+        tool_handler : ToolHandler,
+        messages : list[ChatCompletionMessageParam],
+        protected : int,
+        token_counts : TokenCount,
+        chain_tokens : int
+    ) -> bool:
+        """
+        Check if the next request fits in the token budget of the prompt, compacting the conversation if needed.
+        The estimate includes the tool definitions and room for the response.
+        """
+        remaining = self._remaining_token_budget(prompt, token_counts, chain_tokens)
+        if remaining is None: return True
+        tools_size = estimate_text_tokens(json.dumps(self._tool_definitions(tool_handler)), prompt.model)
+        input_budget = remaining - tools_size - RESPONSE_TOKENS
+        if estimate_tokens(messages, prompt.model) <= input_budget: return True
+        if input_budget > 0:
+            self._compact(messages, protected, token_counts, DefaultCompactionPolicy(token_budget=input_budget, keep_screenshots=0, keep_tool_outputs=0))
+        return estimate_tokens(messages, prompt.model) <= input_budget
+
+    def _max_response_tokens(
+        self,
+        prompt : Prompt,
+        tool_handler : ToolHandler,
+        messages : list[ChatCompletionMessageParam],
+        token_counts : TokenCount,
+        chain_tokens : int
+    ) -> Optional[int]:
+        """
+        The output token cap of the next request, the token budget left once its input is sent.
+        None if the prompt has no token budget.
+        """
+        remaining = self._remaining_token_budget(prompt, token_counts, chain_tokens)
+        if remaining is None: return None
+        tools_size = estimate_text_tokens(json.dumps(self._tool_definitions(tool_handler)), prompt.model)
+        return max(remaining - tools_size - estimate_tokens(messages, prompt.model), 1)
+
+    @staticmethod
+    def _check_response_length(response : ChatCompletion, max_tokens : Optional[int]):
+        """ Raise if the response was cut off by the output token cap, the cut off response is unusable. """
+        if max_tokens is not None and response.choices[0].finish_reason == "length":
+            raise BotTokenBudgetError("token budget exceeded")
+
     def _handle_chat_completion(
         self, 
         model : str,
         tool_handler : ToolHandler,
         messages : list[ChatCompletionMessageParam],
-        token_counts : TokenCount
-    ) -> Tuple[list[ChatCompletionMessageParam], Optional[ToolResponseBase]]:
-        response = self.client.chat.completions.create(
-            messages=messages,
-            model=model,
-            temperature=0.2,
-            top_p=0.1,
-            tools=self._tool_definitions(tool_handler),
-            tool_choice="required"
-        )
-        token_counts.input += response.usage.prompt_tokens if response.usage else 0
-        token_counts.output += response.usage.completion_tokens if response.usage else 0
+        token_counts : TokenCount,
+        image_pipeline : ImagePipeline,
+        max_tokens : Optional[int] = None,
+        tool_pool : Optional[ThreadPoolExecutor] = None
+    ) -> Generator[tuple[str,tuple], object, Tuple[list[ChatCompletionMessageParam], Optional[ToolResponseBase]]]:
+        # the executor is shared by both steps so tool calls started while streaming aren't run again
+        executor = ToolExecutor(tool_handler, self.max_tool_workers, tool_pool)
+        try:
+            return (yield from self._handle_chat_response(executor, model, tool_handler, messages, token_counts, image_pipeline, max_tokens))
+        finally: executor.close()
+
+    def _handle_chat_response(
+        self,
+        executor : ToolExecutor,
+        model : str,
+        tool_handler : ToolHandler,
+        messages : list[ChatCompletionMessageParam],
+        token_counts : TokenCount,
+        image_pipeline : ImagePipeline,
+        max_tokens : Optional[int] = None
+    ) -> Generator[tuple[str,tuple], object, Tuple[list[ChatCompletionMessageParam], Optional[ToolResponseBase]]]:
+        params = {
+            "messages": messages,
+            "model": model,
+            "temperature": 0.2,
+            "top_p": 0.1,
+            "tools": self._tool_definitions(tool_handler),
+            "tool_choice": "required"
+        }
+        # the token budget left after the request's input caps its response
+        if max_tokens is not None: params["max_completion_tokens"] = max_tokens
+        response : ChatCompletion = yield (STEP_COMPLETION, (params, executor, token_counts))
+        if response.usage: token_counts.add(model, response.usage.prompt_tokens, response.usage.completion_tokens)
         if len(response.choices) == 0: raise Exception("unexpected empty response from chat completitions api")
+        self._check_response_length(response, max_tokens)
         out = []
         response_message = response.choices[0].message
         out.append(response_message.to_dict())
         images = []
         if response_message.tool_calls:
-            for call in response_message.tool_calls:
-                resp = self._tool_call(tool_handler, call)
+            tool_responses : list[ToolResponseBase] = yield (STEP_TOOL_CALLS, (executor, response_message.tool_calls))
+            for resp in tool_responses:
                 if isinstance(resp, ToolDoneResponse):
                     return [], resp
                 if isinstance(resp, ToolMessageResponse):
@@ -142,15 +625,19 @@ class OpenAIClient(BaseClient):
                         content=resp.message
                     ))
                     images += resp.images
-            if images: out.append(self._prepare_image_attachments(images))
+            if images:
+                screenshots = image_pipeline.dedupe_screenshots(images)
+                out.append(self._prepare_image_attachments(screenshots, image_pipeline) if screenshots else
+                    ChatCompletionUserMessageParam(content="(the screenshot is unchanged from the previous one)", role="user"))
             return out, None
         return [], None
 
-    def _tool_call(self, tool_handler : ToolHandler, tool_call : ChatCompletionMessageToolCall) -> ToolResponseBase:
-        function_args = json.loads(tool_call.function.arguments)
-        out = tool_handler.call(tool_call.function.name, function_args)
-        out.tool_name = tool_call.function.name
-        out.tool_call_id = tool_call.id
+    def _tool_calls(self, executor : ToolExecutor, tool_calls : list[ChatCompletionMessageToolCall]) -> list[ToolResponseBase]:
+        """ Execute the tool calls of a response concurrently, calls after a 'done' call are skipped. """
+        out = executor.run(list(map(lambda c: (c.id, c.function.name, json.loads(c.function.arguments)), tool_calls)))
+        for resp, tool_call in zip(out, tool_calls):
+            resp.tool_name = tool_call.function.name
+            resp.tool_call_id = tool_call.id
         return out
 
     def _tool_definitions(self, tool_handler : ToolHandler) -> list[ChatCompletionToolParam]:
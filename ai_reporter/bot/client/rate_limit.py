@@ -0,0 +1,219 @@
+import asyncio
+from email.utils import parsedate_to_datetime
+import random
+import threading
+import time
+from typing import Optional
+
+import openai
+
+from ...utils import check_config_type
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_INITIAL_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+RETRY_STATUS_CODES = [408, 409, 429]
+
+class RetryPolicy:
+
+    """
+    Decides if a failed chat completion request should be retried and how long to wait first.
+    Waits for the time the API asks for in retry-after headers, otherwise uses exponential backoff
+    with full jitter so concurrent workers don't retry in lockstep.
+    """
+
+    def __init__(
+        self,
+        max_retries : int = DEFAULT_MAX_RETRIES,
+        initial_delay : float = DEFAULT_INITIAL_DELAY,
+        max_delay : float = DEFAULT_MAX_DELAY
+    ):
+        """
+        :param max_retries: The maximum number of retries of a request.
+        :param initial_delay: The backoff delay in seconds of the first retry, doubled with each retry.
+        :param max_delay: The maximum delay in seconds between retries.
+        """
+        check_config_type(max_retries, int, "config:max_retries")
+        self.max_retries = max_retries
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, error : Exception, attempt : int) -> bool:
+        """
+        Check if a request should be retried.
+
+        :param error: The error the request failed with.
+        :param attempt: The number of retries made so far.
+        """
+        if attempt >= self.max_retries: return False
+        if isinstance(error, openai.APIConnectionError): return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in RETRY_STATUS_CODES or error.status_code >= 500
+        return False
+
+    def delay(self, error : Exception, attempt : int) -> float:
+        """
+        The number of seconds to wait before retrying.
+
+        :param error: The error the request failed with.
+        :param attempt: The number of retries made so far.
+        """
+        retry_after = self.retry_after(error)
+        if retry_after is not None: return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.initial_delay * (2 ** attempt)))
+
+    @staticmethod
+    def retry_after(error : Exception) -> Optional[float]:
+        """
+        The number of seconds the API asked to wait before retrying, None if it didn't say.
+
+        :param error: The error the request failed with.
+        """
+        if not isinstance(error, openai.APIStatusError): return None
+        headers = error.response.headers
+        try:
+            if headers.get("retry-after-ms"): return max(float(headers["retry-after-ms"]) / 1000, 0.0)
+            if headers.get("retry-after"): return max(float(headers["retry-after"]), 0.0)
+        except ValueError: pass
+        try: return max(parsedate_to_datetime(headers.get("retry-after", "")).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError): return None
+
+class RateLimiter:
+
+    """
+    Client side token bucket limiter of requests and tokens per minute. Capacity is reserved before a request is
+    sent, callers that go over the limit wait their turn, so concurrent workers spread their requests evenly over
+    the quota instead of all hitting rate limit errors.
+    """
+
+    def __init__(self, requests_per_minute : int = 0, tokens_per_minute : int = 0):
+        """
+        :param requests_per_minute: The maximum number of requests per minute, unlimited if zero.
+        :param tokens_per_minute: The maximum number of tokens (input and output) per minute, unlimited if zero.
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens : int) -> float:
+        """
+        Reserve capacity for a request and return the number of seconds to wait before sending it.
+
+        :param tokens: The estimated number of tokens of the request.
+        """
+        with self._lock:
+            now = self._refill()
+            wait = max(self._paused_until - now, 0.0)
+            if self.requests_per_minute:
+                self._requests -= 1
+                if self._requests < 0: wait = max(wait, -self._requests * 60 / self.requests_per_minute)
+            if self.tokens_per_minute:
+                self._tokens -= tokens
+                if self._tokens < 0: wait = max(wait, -self._tokens * 60 / self.tokens_per_minute)
+            return wait
+
+    def acquire(self, tokens : int):
+        """
+        Wait until a request can be sent.
+
+        :param tokens: The estimated number of tokens of the request.
+        """
+        wait = self.reserve(tokens)
+        if wait > 0: time.sleep(wait)
+
+    async def acquire_async(self, tokens : int):
+        """
+        Wait until a request can be sent without blocking the event loop.
+
+        :param tokens: The estimated number of tokens of the request.
+        """
+        wait = self.reserve(tokens)
+        if wait > 0: await asyncio.sleep(wait)
+
+    def limit(self, requests_per_minute : int = 0, tokens_per_minute : int = 0):
+        """
+        Lower the limits to the given ones if they are lower, the current capacity is kept within the new limits.
+
+        :param requests_per_minute: The maximum number of requests per minute, unlimited if zero.
+        :param tokens_per_minute: The maximum number of tokens per minute, unlimited if zero.
+        """
+        with self._lock:
+            self._refill()
+            if requests_per_minute and (not self.requests_per_minute or requests_per_minute < self.requests_per_minute):
+                self._requests = min(self._requests, float(requests_per_minute)) if self.requests_per_minute else float(requests_per_minute)
+                self.requests_per_minute = requests_per_minute
+            if tokens_per_minute and (not self.tokens_per_minute or tokens_per_minute < self.tokens_per_minute):
+                self._tokens = min(self._tokens, float(tokens_per_minute)) if self.tokens_per_minute else float(tokens_per_minute)
+                self.tokens_per_minute = tokens_per_minute
+
+    def try_acquire(self, tokens : int) -> bool:
+        """
+        Reserve capacity for an optional request only if it can be sent right away.
+
+        :param tokens: The estimated number of tokens of the request.
+        """
+        with self._lock:
+            now = self._refill()
+            if self._paused_until > now: return False
+            if self.requests_per_minute and self._requests < 1: return False
+            if self.tokens_per_minute and self._tokens < tokens: return False
+            if self.requests_per_minute: self._requests -= 1
+            if self.tokens_per_minute: self._tokens -= tokens
+            return True
+
+    def adjust(self, estimated_tokens : int, actual_tokens : int):
+        """
+        Correct the reserved tokens with the actual usage once a response is received.
+
+        :param estimated_tokens: The number of tokens reserved for the request.
+        :param actual_tokens: The number of tokens the request used.
+        """
+        if not self.tokens_per_minute: return
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens + estimated_tokens - actual_tokens, float(self.tokens_per_minute))
+
+    def pause(self, seconds : float):
+        """
+        Hold back all requests, used when the API reports that the rate limit was hit anyway.
+
+        :param seconds: The number of seconds to pause for.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        if self.requests_per_minute:
+            self._requests = min(self._requests + elapsed * self.requests_per_minute / 60, float(self.requests_per_minute))
+        if self.tokens_per_minute:
+            self._tokens = min(self._tokens + elapsed * self.tokens_per_minute / 60, float(self.tokens_per_minute))
+        return now
+
+_rate_limiters : dict[tuple[str,str],RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(base_url : str, model : str, requests_per_minute : int = 0, tokens_per_minute : int = 0) -> RateLimiter:
+    """
+    Get the process wide rate limiter of an API and model, limits are per model so clients share their limiter.
+    Clients configured with different limits share the limiter with the lowest limits.
+
+    :param base_url: The API URL.
+    :param model: The model.
+    :param requests_per_minute: The maximum number of requests per minute, unlimited if zero.
+    :param tokens_per_minute: The maximum number of tokens per minute, unlimited if zero.
+    """
+    key = (base_url, model)
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(key)
+        if not limiter:
+            limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+            _rate_limiters[key] = limiter
+        else: limiter.limit(requests_per_minute, tokens_per_minute)
+        return limiter
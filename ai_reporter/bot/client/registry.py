@@ -0,0 +1,98 @@
+import asyncio
+import atexit
+import hashlib
+import importlib
+import json
+import logging
+import threading
+from typing import Optional
+import weakref
+
+import openai
+
+from .base_client import BaseClient
+
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 120.0 # long enough to keep connections open while tools run between requests
+HTTP_LIBRARIES = ("httpx", "httpx2") # the HTTP libraries releases of the openai SDK are built on
+
+def _http_library():
+    """ The HTTP library the openai SDK is built on, its clients only accept limits from the same library. """
+    for name in HTTP_LIBRARIES:
+        try: module = importlib.import_module(name)
+        except ImportError: continue
+        if issubclass(openai.DefaultHttpxClient, module.Client): return module
+    raise ImportError("none of the HTTP libraries %s the openai SDK is built on is installed" % ", ".join(HTTP_LIBRARIES))
+
+CONNECTION_LIMITS = _http_library().Limits(
+    max_connections=MAX_CONNECTIONS,
+    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=KEEPALIVE_EXPIRY
+)
+
+class ClientRegistry:
+
+    """
+    Process wide cache of configured bot clients and the HTTP connection pools they share, so reports
+    reuse open keep-alive connections instead of paying connection setup for every report.
+    """
+
+    def __init__(self):
+        self._clients : dict[tuple[str,Optional[logging.Logger]],BaseClient] = {}
+        self._http_client : Optional[openai.DefaultHttpxClient] = None
+        # async connection pools are bound to the event loop they are used in
+        self._async_http_clients : weakref.WeakKeyDictionary[asyncio.AbstractEventLoop,openai.DefaultAsyncHttpxClient] = weakref.WeakKeyDictionary()
+        # reentrant, clients request the shared connection pools while they are created
+        self._lock = threading.RLock()
+
+    def get(self, client_class : type[BaseClient], config : dict, logger : Optional[logging.Logger] = None) -> BaseClient:
+        """
+        Get the bot client for a configuration, create it if this configuration wasn't used before.
+
+        :param client_class: The bot client class.
+        :param config: The bot client configuration.
+        :param logger: Optional logger.
+        """
+        key = (self.fingerprint(client_class.name(), config), logger)
+        with self._lock:
+            if key not in self._clients: self._clients[key] = client_class(logger=logger, **config)
+            return self._clients[key]
+
+    @staticmethod
+    def fingerprint(name : str, config : dict) -> str:
+        """
+        Hash of a bot client name and configuration.
+
+        :param name: The bot client name.
+        :param config: The bot client configuration.
+        """
+        data = json.dumps({"name": name, "config": config}, sort_keys=True, default=repr)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def http_client(self) -> openai.DefaultHttpxClient:
+        """ The keep-alive HTTP connection pool shared by all clients. """
+        with self._lock:
+            if not self._http_client: self._http_client = openai.DefaultHttpxClient(limits=CONNECTION_LIMITS)
+            return self._http_client
+
+    def async_http_client(self) -> openai.DefaultAsyncHttpxClient:
+        """ The keep-alive HTTP connection pool shared by all clients in the running event loop. """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._async_http_clients:
+                self._async_http_clients[loop] = openai.DefaultAsyncHttpxClient(limits=CONNECTION_LIMITS)
+            return self._async_http_clients[loop]
+
+    def close(self):
+        """ Close the shared connection pools and forget all cached clients. """
+        with self._lock:
+            for client in self._clients.values(): client.close()
+            self._clients.clear()
+            if self._http_client: self._http_client.close()
+            self._http_client = None
+            # async pools can only be closed from their event loop, open connections are dropped with the loop
+            self._async_http_clients.clear()
+
+CLIENT_REGISTRY = ClientRegistry()
+atexit.register(CLIENT_REGISTRY.close)
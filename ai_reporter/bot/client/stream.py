@@ -0,0 +1,83 @@
+import json
+from typing import Callable, Optional
+
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+class StreamAccumulator:
+
+    """
+    Assembles a streamed chat completion from its chunks. Tool calls are reported as soon as their
+    arguments are complete, while the bot is still generating the rest of the response.
+    """
+
+    def __init__(self, on_tool_call : Optional[Callable[[str,str,dict],None]] = None):
+        """
+        :param on_tool_call: Called with the tool call id, tool name and arguments of each complete tool call.
+        """
+        self.on_tool_call = on_tool_call
+        self.dispatched : set[str] = set()
+        self._chunk : Optional[ChatCompletionChunk] = None
+        self._content = ""
+        self._finish_reason : Optional[str] = None
+        self._tool_calls : dict[int,dict] = {}
+        self._usage = None
+
+    def add(self, chunk : ChatCompletionChunk):
+        """
+        Add the next chunk of the stream.
+
+        :param chunk: The chunk.
+        """
+        self._chunk = chunk
+        if chunk.usage: self._usage = chunk.usage
+        for choice in chunk.choices:
+            if choice.index != 0: continue
+            if choice.finish_reason: self._finish_reason = choice.finish_reason
+            if choice.delta.content: self._content += choice.delta.content
+            for delta in choice.delta.tool_calls or []:
+                # a new call starts when the previous one is complete
+                if delta.index not in self._tool_calls: self._dispatch()
+                tool_call = self._tool_calls.setdefault(delta.index, {"id": "", "name": "", "arguments": ""})
+                if delta.id: tool_call["id"] = delta.id
+                if delta.function and delta.function.name: tool_call["name"] += delta.function.name
+                if delta.function and delta.function.arguments:
+                    tool_call["arguments"] += delta.function.arguments
+                    # arguments can only be complete at a closing brace, don't parse partial arguments for nothing
+                    if "}" in delta.function.arguments: self._dispatch()
+
+    def finish(self) -> ChatCompletion:
+        """ Report the remaining tool calls and return the complete response once the stream has ended. """
+        self._dispatch()
+        tool_calls = list(map(lambda i: {
+            "id": self._tool_calls[i]["id"],
+            "type": "function",
+            "function": {"name": self._tool_calls[i]["name"], "arguments": self._tool_calls[i]["arguments"]}
+        }, sorted(self._tool_calls)))
+        message = {"role": "assistant", "content": self._content or None}
+        if tool_calls: message["tool_calls"] = tool_calls
+        return ChatCompletion.model_validate({
+            "id": self._chunk.id if self._chunk else "",
+            "created": self._chunk.created if self._chunk else 0,
+            "model": self._chunk.model if self._chunk else "",
+            "object": "chat.completion",
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": self._finish_reason or ("tool_calls" if tool_calls else "stop")
+            }] if self._chunk else [],
+            "usage": self._usage.model_dump() if self._usage else None
+        })
+
+    def _dispatch(self):
+        if not self.on_tool_call: return
+        # report calls in order, calls on a shared resource must run in the order the bot made them
+        for index in sorted(self._tool_calls):
+            tool_call = self._tool_calls[index]
+            if tool_call["id"] in self.dispatched: continue
+            # the call can't be matched with its response without an id, leave it for after the stream
+            if not tool_call["id"]: return
+            try: args = json.loads(tool_call["arguments"])
+            except ValueError: return
+            if not isinstance(args, dict): return
+            self.dispatched.add(tool_call["id"])
+            self.on_tool_call(tool_call["id"], tool_call["name"], args)
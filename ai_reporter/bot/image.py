@@ -1,9 +1,27 @@
 import base64
+from collections import OrderedDict
+import hashlib
+import io
 from mimetypes import MimeTypes
-from typing import IO, Optional, Self
+import threading
+from typing import IO, Iterable, Optional, Self
 
+from PIL import Image as PILImage
+from PIL import ImageChops
 import requests
 
+from ..error.config import ConfigParameterValueError
+from ..utils import check_config_type
+
+BASE64_CACHE_SIZE = 32
+HASH_SIZE = 16
+DEDUPE_MAX_CHANGED_PIXELS = 64 # about a blinking text cursor
+IMAGE_FORMATS = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+IMAGE_DETAILS = ["auto", "low", "high"]
+
+_base64_cache : OrderedDict[tuple[str,bytes],str] = OrderedDict()
+_base64_cache_lock = threading.Lock()
+
 class Image:
 
     """
@@ -47,14 +65,131 @@ class Image:
 
     def to_base64(self) -> Optional[str]:
         """
-        Convert the image to a base64 data URI.
+        Convert the image to a base64 data URI. Results are memoized by content hash.
+        """
+        if not self.contents: return None
+        key = (self.mime, hashlib.sha256(self.contents).digest())
+        with _base64_cache_lock:
+            if key in _base64_cache:
+                _base64_cache.move_to_end(key)
+                return _base64_cache[key]
+        out = ("data:%s;base64," % (self.mime)) + base64.b64encode(self.contents).decode()
+        with _base64_cache_lock:
+            _base64_cache[key] = out
+            while len(_base64_cache) > BASE64_CACHE_SIZE: _base64_cache.popitem(last=False)
+        return out
+
+    def perceptual_hash(self) -> Optional[int]:
+        """
+        Difference hash of the image, similar looking images have hashes that differ in few bits.
         """
         if not self.contents: return None
-        return ("data:%s;base64," % (self.mime)) + base64.b64encode(self.contents).decode()
+        with PILImage.open(io.BytesIO(self.contents)) as img:
+            pixels = list(img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), PILImage.Resampling.BILINEAR).getdata())
+        out = 0
+        for row in range(HASH_SIZE):
+            for col in range(HASH_SIZE):
+                i = row * (HASH_SIZE + 1) + col
+                out = (out << 1) | (pixels[i] > pixels[i + 1])
+        return out
 
     @staticmethod    
     def _guess_mime(path : str):
         mime = MimeTypes()
         mime_str = mime.guess_type(path)[0]
         if mime_str and mime_str.startswith("image/"): return mime_str
-        return "image/png"
\ No newline at end of file
+        return "image/png"
+
+class ImagePipeline:
+
+    """
+    Prepares images before they are sent to the bot. Images are scaled down to the size limits of the model,
+    re-encoded to a smaller format and screenshots that look the same as the previous one are dropped.
+    The pipeline remembers the last screenshot, use a new pipeline for each conversation.
+    """
+
+    def __init__(
+        self,
+        max_long_side : int = 2048,
+        max_short_side : int = 768,
+        format : str = "jpeg",
+        quality : int = 85,
+        dedupe : bool = True,
+        detail : str = "high"
+    ):
+        """
+        :param max_long_side: Scale images down so the long side is at most this many pixels.
+        :param max_short_side: Scale images down so the short side is at most this many pixels.
+        :param format: Re-encode images to 'jpeg', 'webp' or 'png', keep the original encoding if empty.
+        :param quality: The quality of re-encoded JPEG and WebP images, 1 to 100.
+        :param dedupe: Drop screenshots that look the same as the previous screenshot.
+        :param detail: The detail level the model should process images at, 'auto', 'low' or 'high'.
+        """
+        check_config_type(max_long_side, int, "config:images.max_long_side")
+        check_config_type(max_short_side, int, "config:images.max_short_side")
+        check_config_type(format, str, "config:images.format")
+        check_config_type(quality, int, "config:images.quality")
+        check_config_type(dedupe, bool, "config:images.dedupe")
+        check_config_type(detail, str, "config:images.detail")
+        if format and format not in IMAGE_FORMATS:
+            raise ConfigParameterValueError("invalid image format '%s', expected one of %s" % (format, ", ".join(IMAGE_FORMATS.keys())))
+        if detail not in IMAGE_DETAILS:
+            raise ConfigParameterValueError("invalid image detail '%s', expected one of %s" % (detail, ", ".join(IMAGE_DETAILS)))
+        self.max_long_side = max_long_side
+        self.max_short_side = max_short_side
+        self.format = format
+        self.quality = quality
+        self.dedupe = dedupe
+        self.detail = detail
+        self._last_hash : Optional[int] = None
+        self._last : Optional[Image] = None
+
+    def process(self, image : Image) -> Image:
+        """
+        Scale down and re-encode an image, the original image is returned if it can't be decoded.
+
+        :param image: The image.
+        """
+        if not image.contents: return image
+        try:
+            with PILImage.open(io.BytesIO(image.contents)) as img:
+                width, height = img.size
+                scale = min(1.0, self.max_long_side / max(width, height), self.max_short_side / min(width, height))
+                if scale >= 1.0 and (not self.format or IMAGE_FORMATS[self.format] == image.mime): return image
+                # resized images have no format, read it first to keep the original encoding
+                image_format = self.format or (img.format or "png").lower()
+                if scale < 1.0: img = img.resize((max(1, round(width * scale)), max(1, round(height * scale))), PILImage.Resampling.LANCZOS)
+                if image_format == "jpeg" and img.mode != "RGB": img = img.convert("RGB")
+                out = io.BytesIO()
+                img.save(out, format=image_format.upper(), quality=self.quality)
+        except (OSError, ValueError, KeyError): return image
+        # keep the original when re-encoding doesn't make it smaller
+        if scale >= 1.0 and out.tell() >= len(image.contents): return image
+        return Image(IMAGE_FORMATS.get(image_format, image.mime), out.getvalue())
+
+    def dedupe_screenshots(self, images : Iterable[Image]) -> list[Image]:
+        """
+        Drop screenshots that look the same as the previous screenshot, does nothing if deduplication is disabled.
+
+        :param images: The screenshots in the order they were taken.
+        """
+        out = []
+        for image in images:
+            if self.dedupe and image.contents:
+                try:
+                    image_hash = image.perceptual_hash()
+                    if image_hash == self._last_hash and self._last and self._changed_pixels(self._last, image) <= DEDUPE_MAX_CHANGED_PIXELS:
+                        continue
+                except (OSError, ValueError): image_hash = None
+                self._last_hash = image_hash
+                self._last = image
+            out.append(image)
+        return out
+
+    @staticmethod
+    def _changed_pixels(a : Image, b : Image) -> int:
+        """ Number of pixels that differ between two images, the perceptual hash alone misses small text changes. """
+        with PILImage.open(io.BytesIO(a.contents or b"")) as img_a, PILImage.open(io.BytesIO(b.contents or b"")) as img_b:
+            if img_a.size != img_b.size: return img_a.size[0] * img_a.size[1]
+            diff = ImageChops.difference(img_a.convert("RGB"), img_b.convert("RGB")).convert("L")
+            return diff.width * diff.height - diff.histogram()[0]
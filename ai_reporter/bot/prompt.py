@@ -28,7 +28,12 @@ class Prompt:
         model : str = "gpt-4o-mini",
         max_iterations : int = 20,
         max_error_retry : int = 3,
-        max_iteration_prompt : str = DEFAULT_MAX_ITERATION_PROMPT
+        max_iteration_prompt : str = DEFAULT_MAX_ITERATION_PROMPT,
+        token_budget : int = 0,
+        chain_token_budget : int = 0,
+        navigation_model : str = "",
+        final_model : str = "",
+        stall_iterations : int = 2
     ):
 
         """
@@ -41,6 +46,11 @@ class Prompt:
         :param max_iterations: The maximum number of loops to take before forcing the bot to finish.
         :param max_error_retry: The maximum number of retries before giving up after the bot returns an erroneous response.
         :param max_iteration_prompt: The prompt to send to the bot when the maximum number of loops has been reached and it is forced to finish.
+        :param token_budget: The maximum number of tokens (input and output) the report may use, unlimited if zero.
+        :param chain_token_budget: The maximum number of tokens a chain of reports may use up to and including this report, unlimited if zero.
+        :param navigation_model: A faster LLM for the tool navigation iterations, escalates to `model` after an erroneous response or a stall. Uses `model` if empty.
+        :param final_model: The LLM for the final iteration when the bot is forced to finish. Uses `model` if empty.
+        :param stall_iterations: Escalate from the navigation model after this many iterations in a row that only repeat earlier tool calls, never if zero.
         """
         check_config_type(user_prompt, str, "prompt:user_prompt")
         self.user_prompt = user_prompt
@@ -60,6 +70,16 @@ class Prompt:
         self.max_error_retry = max_error_retry
         check_config_type(max_iteration_prompt, str, "prompt:max_iteration_prompt")
         self.max_iteration_prompt = max_iteration_prompt
+        check_config_type(token_budget, int, "prompt:token_budget")
+        self.token_budget = token_budget
+        check_config_type(chain_token_budget, int, "prompt:chain_token_budget")
+        self.chain_token_budget = chain_token_budget
+        check_config_type(navigation_model, str, "prompt:navigation_model")
+        self.navigation_model = navigation_model
+        check_config_type(final_model, str, "prompt:final_model")
+        self.final_model = final_model
+        check_config_type(stall_iterations, int, "prompt:stall_iterations")
+        self.stall_iterations = stall_iterations
 
     def to_dict(self) -> dict:
         return {
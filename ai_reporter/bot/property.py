@@ -64,18 +64,19 @@ class PropertyDefinition:
 
         :param value: Value to check.
         """
+        # matches the JSON schema of `to_dict`, enums are strings and JSON numbers may be written without a fraction
         match self.type:
-            case PropertyType.STR:
+            case PropertyType.STR | PropertyType.ENUM:
                 return isinstance(value, str)
             case PropertyType.INT:
-                return isinstance(value, int)
+                return isinstance(value, int) and not isinstance(value, bool)
             case PropertyType.FLOAT:
-                return isinstance(value, float)
+                return isinstance(value, (int, float)) and not isinstance(value, bool)
             case PropertyType.BOOL:
                 return isinstance(value, bool)
             case PropertyType.DICT:
                 return isinstance(value, dict)
-            case PropertyType.LIST | PropertyType.ENUM:
+            case PropertyType.LIST:
                 return isinstance(value, list)
 
     def check_required(self, value : Any) -> bool:
@@ -14,4 +14,19 @@ class BotResults:
         return self.tokens.input if self.tokens else 0
 
     def output_tokens(self) -> int:
-        return self.tokens.output if self.tokens else 0
\ No newline at end of file
+        return self.tokens.output if self.tokens else 0
+
+    @property
+    def saved_tokens(self) -> int:
+        """ Estimated input tokens saved by context compaction. """
+        return self.tokens.saved if self.tokens else 0
+
+    @property
+    def hedged_tokens(self) -> int:
+        """ Tokens used by duplicate requests of hedged chat completions. """
+        return self.tokens.hedged if self.tokens else 0
+
+    @property
+    def model_tokens(self) -> dict[str,dict[str,int]]:
+        """ Input and output tokens per model. """
+        return self.tokens.models if self.tokens else {}
@@ -0,0 +1,59 @@
+import json
+from typing import Optional
+
+from .prompt import Prompt
+
+class ModelRouter:
+
+    """
+    Picks the model for each iteration of a report. Tool navigation uses the prompt's navigation model when
+    one is set, the router escalates to the prompt's main model for the rest of the report once the bot
+    returns an erroneous response or stalls by repeating tool calls it already made. The forced final
+    iteration uses the prompt's final model.
+    """
+
+    def __init__(self, prompt : Prompt):
+        """
+        :param prompt: The prompt.
+        """
+        self.prompt = prompt
+        self.escalated = False
+        self._tool_calls : set[str] = set()
+        self._stalled_iterations = 0
+
+    def model(self, finishing : bool = False) -> str:
+        """
+        The model for the next request.
+
+        :param finishing: The bot is forced to finish its report.
+        """
+        if finishing: return self.prompt.final_model or self.prompt.model
+        if self.escalated or not self.prompt.navigation_model: return self.prompt.model
+        return self.prompt.navigation_model
+
+    def error(self) -> Optional[str]:
+        """ Record an erroneous response from the bot, returns the reason if the router escalates. """
+        return self._escalate("error")
+
+    def response(self, message : dict) -> Optional[str]:
+        """
+        Record the tool calls of a response from the bot, returns the reason if the router escalates.
+
+        :param message: The response message.
+        """
+        signatures = set(map(
+            lambda c: json.dumps([c.get("function", {}).get("name"), c.get("function", {}).get("arguments")]),
+            message.get("tool_calls") or []
+        ))
+        # the bot learns nothing new from calls it already made
+        if signatures and signatures <= self._tool_calls: self._stalled_iterations += 1
+        else: self._stalled_iterations = 0
+        self._tool_calls |= signatures
+        if self.prompt.stall_iterations and self._stalled_iterations >= self.prompt.stall_iterations:
+            return self._escalate("stall")
+        return None
+
+    def _escalate(self, reason : str) -> Optional[str]:
+        if self.escalated or not self.prompt.navigation_model or self.prompt.navigation_model == self.prompt.model: return None
+        self.escalated = True
+        return reason
@@ -4,4 +4,26 @@ class TokenCount():
 
     def __init__(self):
         self.input = 0
-        self.output = 0
\ No newline at end of file
+        self.output = 0
+        # estimated input tokens not sent because of context compaction
+        self.saved = 0
+        # estimated tokens currently removed from the conversation by context compaction
+        self.removed = 0
+        # tokens used by duplicate requests of hedged chat completions whose response wasn't used
+        self.hedged = 0
+        # input and output tokens per model
+        self.models : dict[str,dict[str,int]] = {}
+
+    def add(self, model : str, input : int, output : int):
+        """
+        Count the tokens of a chat completion.
+
+        :param model: The model of the chat completion.
+        :param input: The number of input tokens.
+        :param output: The number of output tokens.
+        """
+        self.input += input
+        self.output += output
+        counts = self.models.setdefault(model, {"input": 0, "output": 0})
+        counts["input"] += input
+        counts["output"] += output
\ No newline at end of file
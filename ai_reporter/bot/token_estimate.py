@@ -0,0 +1,119 @@
+import base64
+from collections import OrderedDict
+import io
+import math
+import threading
+from typing import Iterable, Optional
+
+from PIL import Image as PILImage
+
+try:
+    import tiktoken
+except ImportError: # optional, used for more accurate estimates when installed
+    tiktoken = None
+
+CHARS_PER_TOKEN = 4
+MESSAGE_TOKENS = 4 # per message overhead for the role and separators
+IMAGE_TOKENS = 765 # a high detail 1024x768 image, used when the image size can't be read
+IMAGE_BASE_TOKENS = 85
+IMAGE_TILE_TOKENS = 170
+IMAGE_TILE_SIZE = 512
+IMAGE_MAX_LONG_SIDE = 2048
+IMAGE_MAX_SHORT_SIDE = 768
+IMAGE_CACHE_SIZE = 64
+DEFAULT_ENCODING = "o200k_base"
+
+_image_tokens_cache : OrderedDict[str,int] = OrderedDict()
+_encodings : dict[str,Optional[object]] = {}
+_lock = threading.Lock()
+
+def estimate_text_tokens(text : str, model : str = "") -> int:
+    """
+    Estimate the number of tokens in a text. Uses tiktoken when it is installed, otherwise
+    roughly four characters per token for English text and code.
+
+    :param text: The text.
+    :param model: The model the text is sent to.
+    """
+    encoding = _encoding(model)
+    if encoding: return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def estimate_image_tokens(url : str, detail : str = "high") -> int:
+    """
+    Estimate the number of tokens of an image the way OpenAI vision models count them: the image is scaled to fit
+    2048x2048 and then to 768 pixels on the short side, each 512x512 tile costs 170 tokens plus 85 base tokens.
+
+    :param url: The image URL, the size is only known for base64 data URIs.
+    :param detail: The image detail level, low detail images have a fixed cost.
+    """
+    if detail == "low": return IMAGE_BASE_TOKENS
+    with _lock:
+        if url in _image_tokens_cache:
+            _image_tokens_cache.move_to_end(url)
+            return _image_tokens_cache[url]
+    out = IMAGE_TOKENS
+    size = _image_size(url)
+    if size:
+        width, height = size
+        scale = min(1.0, IMAGE_MAX_LONG_SIDE / max(width, height), IMAGE_MAX_SHORT_SIDE / min(width, height))
+        tiles = math.ceil(width * scale / IMAGE_TILE_SIZE) * math.ceil(height * scale / IMAGE_TILE_SIZE)
+        out = IMAGE_BASE_TOKENS + IMAGE_TILE_TOKENS * tiles
+    with _lock:
+        _image_tokens_cache[url] = out
+        while len(_image_tokens_cache) > IMAGE_CACHE_SIZE: _image_tokens_cache.popitem(last=False)
+    return out
+
+def estimate_message_tokens(message : dict, model : str = "") -> int:
+    """
+    Estimate the number of input tokens of a chat message.
+
+    :param message: The chat message.
+    :param model: The model the message is sent to.
+    """
+    out = MESSAGE_TOKENS
+    content = message.get("content")
+    if isinstance(content, str):
+        out += estimate_text_tokens(content, model)
+    elif isinstance(content, Iterable):
+        for part in content:
+            match part.get("type"):
+                case "text": out += estimate_text_tokens(part.get("text", ""), model)
+                case "image_url":
+                    image_url = part.get("image_url", {})
+                    out += estimate_image_tokens(image_url.get("url", ""), image_url.get("detail", "high"))
+    for tool_call in message.get("tool_calls") or []:
+        function = tool_call.get("function", {})
+        out += estimate_text_tokens(function.get("name", ""), model) + estimate_text_tokens(function.get("arguments", ""), model)
+    return out
+
+def estimate_tokens(messages : Iterable[dict], model : str = "") -> int:
+    """
+    Estimate the number of input tokens of a list of chat messages.
+
+    :param messages: The chat messages.
+    :param model: The model the messages are sent to.
+    """
+    return sum(map(lambda m: estimate_message_tokens(m, model), messages))
+
+def _image_size(url : str) -> Optional[tuple[int,int]]:
+    if not url.startswith("data:"): return None
+    data = url.partition(",")[2]
+    # image headers are near the start of the file, only decode the whole image if needed
+    for length in (8192, len(data)):
+        try:
+            with PILImage.open(io.BytesIO(base64.b64decode(data[:length - length % 4]))) as img: return img.size
+        except Exception: continue
+    return None
+
+def _encoding(model : str):
+    if not tiktoken: return None
+    with _lock:
+        if model in _encodings: return _encodings[model]
+    try:
+        try: encoding = tiktoken.encoding_for_model(model)
+        except KeyError: encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+    # encodings are downloaded on first use, fall back to the character estimate when offline
+    except Exception: encoding = None
+    with _lock: _encodings[model] = encoding
+    return encoding
@@ -10,6 +10,8 @@ from ...utils import check_config_type
 from ..property import PropertyDefinition
 from .response import ToolResponseBase
 
+WORK_PATH = os.path.join(tempfile.gettempdir(), "_ai_reporter_work")
+
 class BaseTool:
 
     """ Base class for tool. """
@@ -18,7 +20,7 @@ class BaseTool:
         self.state = state
         self.logger = logger
         self.args = kwargs
-        self.work_path = os.path.join(tempfile.gettempdir(), "_ai_reporter_work")
+        self.work_path = WORK_PATH
         os.makedirs(self.work_path, exist_ok=True)
 
     @staticmethod
@@ -39,11 +41,31 @@ class BaseTool:
         """ The parameters of the arguments to call the tool with. """
         ...
 
+    @staticmethod
+    def resource() -> Optional[str]:
+        """ Name of the stateful resource the tool uses, calls to tools sharing a resource never run concurrently. """
+        return None
+
     @abstractmethod
     def execute(self, *args, **kwargs) -> ToolResponseBase: 
         """ Execute the tool. """
         ...
 
+    @classmethod
+    def warm_up(cls, state : dict[str,object], logger : Optional[logging.Logger] = None, **kwargs):
+        """
+        Prepare the resources the tool needs ahead of its first call, does nothing by default.
+        Runs in a background thread while the bot waits for its first response.
+
+        :param state: The state shared by the tools of a tool handler.
+        :param logger: Optional logger.
+        """
+        ...
+
+    def close(self):
+        """ Release the resources the tool holds after it is executed, does nothing by default. """
+        ...
+
     def __str__(self):
         return "tool '%s'" % self.name()
 
@@ -0,0 +1,95 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+from typing import Optional
+
+from .done import DoneTool
+from .handler import ToolHandler
+from .response import ToolResponseBase
+
+DEFAULT_MAX_WORKERS = 4
+
+class ToolCallSkippedError(Exception):
+    """ Tool call was not executed because an earlier call on the same resource failed. """
+    pass
+
+class ToolExecutor:
+
+    """
+    Executes the tool calls of a single bot response concurrently on a bounded thread pool.
+    Calls to tools that share a stateful resource (such as the web browser) run one after another
+    in the order the bot made them, responses are always returned in call order.
+    Calls can be submitted one at a time as they arrive, such as from a streamed response.
+    """
+
+    def __init__(self, tool_handler : ToolHandler, max_workers : int = DEFAULT_MAX_WORKERS, pool : Optional[ThreadPoolExecutor] = None):
+        """
+        :param tool_handler: The tool handler to execute the calls with.
+        :param max_workers: The maximum number of tool calls to run at the same time.
+        :param pool: Thread pool of at most max_workers threads shared by the executors of a conversation, it is not shut down
+            when the executor is closed. The executor creates its own pool if not provided.
+        """
+        self.tool_handler = tool_handler
+        self.max_workers = max_workers
+        self._futures : dict[str,Future] = {}
+        self._resource_futures : dict[str,Future] = {}
+        self._done = False
+        self._pool = pool
+        self._owns_pool = pool is None
+        self._lock = threading.Lock()
+
+    def submit(self, call_id : str, name : str, args : dict) -> Optional[Future]:
+        """
+        Start executing a tool call, returns None if it is not executed because it comes after a 'done' call.
+
+        :param call_id: The tool call id, a call with the id of an earlier call is not executed again.
+        :param name: The tool name.
+        :param args: The tool arguments.
+        """
+        with self._lock:
+            if call_id and call_id in self._futures: return self._futures[call_id]
+            if self._done: return None
+            self._done = name == DoneTool.name()
+            resource = self._resource(name)
+            previous = self._resource_futures.get(resource) if resource else None
+            if self.max_workers <= 1:
+                future = Future()
+                try: future.set_result(self._call(name, args, previous))
+                except Exception as e: future.set_exception(e)
+            else:
+                if not self._pool: self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+                future = self._pool.submit(self._call, name, args, previous)
+            if resource: self._resource_futures[resource] = future
+            if call_id: self._futures[call_id] = future
+            return future
+
+    def run(self, calls : list[tuple[str,str,dict]]) -> list[ToolResponseBase]:
+        """
+        Execute tool calls and return their responses in call order. Calls after the first 'done' call are skipped,
+        calls that were already submitted are not executed again. If calls fail, the error of the first failed call
+        is raised once all calls have finished.
+
+        :param calls: List of tool call id, tool name and arguments.
+        """
+        try:
+            futures = []
+            for call_id, name, args in calls:
+                future = self.submit(call_id, name, args)
+                if not future: break
+                futures.append(future)
+            errors = list(filter(None, map(lambda f: f.exception(), futures)))
+            if errors: raise errors[0]
+            return list(map(lambda f: f.result(), futures))
+        finally: self.close()
+
+    def close(self):
+        """ Stop the worker threads of the executor's own pool once running calls have finished. """
+        if self._pool and self._owns_pool: self._pool.shutdown(wait=False)
+
+    def _call(self, name : str, args : dict, previous : Optional[Future]) -> ToolResponseBase:
+        # the bot expects calls on a stateful resource to follow the earlier ones, don't run them if one failed
+        if previous and previous.exception(): raise ToolCallSkippedError("tool call '%s' skipped after an earlier call failed" % name)
+        return self.tool_handler.call(name, args)
+
+    def _resource(self, name : str) -> Optional[str]:
+        tool = self.tool_handler.get_tool(name)
+        return tool.resource() if tool else None
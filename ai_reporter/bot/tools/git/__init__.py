@@ -1,8 +1,13 @@
 from .list_dir import GitListDirTool
 from .read_file import GitReadFileTool
+from .read_files import GitReadFilesTool
 from .search_file import GitSearchFileTool
-from .read_file import GitReadFileTool
+from .search_string import GitSearchStringTool
 from .file_history import GitFileHistoryTool
 from .list_commits import GitListCommitsTool
+from .diff import GitDiffTool
+from .find_symbol import GitFindSymbolTool
+from .outline_file import GitOutlineFileTool
 
-TOOLS = [GitListDirTool, GitReadFileTool, GitSearchFileTool, GitReadFileTool, GitFileHistoryTool, GitListCommitsTool]
\ No newline at end of file
+TOOLS = [GitListDirTool, GitReadFileTool, GitSearchFileTool, GitSearchStringTool, GitFileHistoryTool, GitListCommitsTool, GitDiffTool,
+    GitFindSymbolTool, GitOutlineFileTool, GitReadFilesTool]
\ No newline at end of file
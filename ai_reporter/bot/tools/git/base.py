@@ -1,12 +1,19 @@
-import os
+from contextlib import ExitStack
+import logging
 from string import Template
+from typing import Optional, Union
 
 from git import Commit, GitCommandError, Repo
 
 from ....error.bot import ToolPropertyInvalidError
+from ....utils import check_config_type
 from ...property import PropertyDefinition
 from ..base import BaseTool
 from ..response import ToolMessageResponse
+from .commit_index import CommitIndex, IndexedCommit
+from .path_index import PathIndex
+from .repository import DEFAULT_FETCH_INTERVAL, REPOSITORY_MANAGER, RepositoryManager
+from .trigram_index import TrigramIndex
 
 COMMIT_TEMPLATE = """
 COMMIT: $id
@@ -17,37 +24,85 @@ MESSAGE: $message
 
 class BaseGitTool(BaseTool):
 
+    def __init__(
+        self,
+        fetch_interval : int = DEFAULT_FETCH_INTERVAL,
+        max_disk_usage : int = 0,
+        clone_filter : str = "",
+        clone_depth : int = 0,
+        clone_single_branch : bool = False,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self._check_config_type(fetch_interval, int, "tools.git.fetch_interval")
+        self._check_config_type(max_disk_usage, int, "tools.git.max_disk_usage")
+        self._check_config_type(clone_filter, str, "tools.git.clone_filter")
+        self._check_config_type(clone_depth, int, "tools.git.clone_depth")
+        self._check_config_type(clone_single_branch, bool, "tools.git.clone_single_branch")
+        self.fetch_interval = fetch_interval
+        self.max_disk_usage = max_disk_usage
+        self.clone_filter = clone_filter
+        self.clone_depth = clone_depth
+        self.clone_single_branch = clone_single_branch
+        # keeps the opened repositories from being evicted until the tool is closed
+        self._repos_in_use = ExitStack()
+
     def execute(self, repository : str, **kwargs):
         self.repo = self._open_repo(repository)
         return ToolMessageResponse("(none)")
 
     @staticmethod
-    def properties():
+    def properties(**kwargs):
         return [
             PropertyDefinition("repository", description="The Git repository to use.", required=True)
         ]
 
+    @classmethod
+    def warm_up(cls, state : dict[str,object], logger : Optional[logging.Logger] = None, repositories : list[str] = [], **kwargs):
+        """
+        Clone or fetch the repositories listed in the 'repositories' configuration and build their indexes.
+
+        :param state: The state shared by the tools of a tool handler.
+        :param logger: Optional logger.
+        :param repositories: The repositories the bot is expected to use.
+        """
+        check_config_type(repositories, list, "tools.git.repositories")
+        if not repositories: return
+        tool = cls(state=state, logger=logger, **kwargs)
+        for url in repositories:
+            try: repo = tool._open_repo(url)
+            except ToolPropertyInvalidError: continue
+            try:
+                commit = repo.head.commit
+                PathIndex.for_commit(commit)
+                CommitIndex(repo).update()
+                # content indexes of partial clones would fetch every blob up front
+                if not tool.clone_filter: TrigramIndex.for_commit(commit)
+            finally: tool.close()
+            tool._log("Warmed up repository '%s'." % url, {"action": "warm up", "object": tool, "git_repository": url})
+
+    def close(self):
+        self._repos_in_use.close()
+
+    @property
+    def repository_manager(self) -> RepositoryManager:
+        """ The repository manager shared by the tool handler. """
+        manager = self.state.get("repository_manager")
+        return manager if isinstance(manager, RepositoryManager) else REPOSITORY_MANAGER
+
     def _open_repo(self, repo : str) -> Repo:
-        if "repo_name" in self.state and self.state["repo_name"] == repo and isinstance(self.state["repo"], Repo):
-            return self.state["repo"]
-        repo_name = os.path.basename(repo)
-        path_to = os.path.join(self.work_path, repo_name)
-        if os.path.exists(path_to):
-            self.state["repo"] = Repo.init(path_to)
-            try: self.state["repo"].remotes[0].pull()
-            except: pass
-            return self.state["repo"]
         try:
-            return Repo.clone_from(repo, path_to)
+            return self._repos_in_use.enter_context(self.repository_manager.use(repo, self.fetch_interval, self.max_disk_usage,
+                self.clone_filter, self.clone_depth, self.clone_single_branch))
         except GitCommandError as e:
             self._log_error("Git error when cloning '%s'." % repo, e, {"git_repository": repo})
             # TODO is there a way to determine if this is a bot error or a user configuration error?
             raise ToolPropertyInvalidError(self.name(), "repository")
 
-    def _display_commit(self, commit : Commit) -> str:
+    def _display_commit(self, commit : Union[Commit, IndexedCommit]) -> str:
         return Template(COMMIT_TEMPLATE.strip()).substitute({
             "id": commit.hexsha,
             "author": commit.author,
             "date": commit.authored_datetime.strftime("%Y-%m-%d"),
-            "message": commit.message
+            "message": str(commit.message).strip()
         })
@@ -0,0 +1,172 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import os
+import tempfile
+import threading
+from typing import Callable, Hashable, Iterator, Optional, TypeVar
+
+from git import Repo
+
+CACHE_DIR_NAME = "ai_reporter"
+BLOB_CACHE_SIZE = 67108864 # 64MB
+BINARY_CHECK_SIZE = 8000 # same as git, files with a NUL byte in the first 8000 bytes are binary
+
+T = TypeVar("T")
+
+def cache_path(repo : Repo, *parts : str) -> str:
+    """
+    Get a path inside the cache directory of a cloned repository, creating parent directories as needed.
+    Cache files live inside the repository's git directory so they are removed along with the clone.
+
+    :param repo: The repository.
+    :param parts: Path components relative to the cache directory.
+    """
+    path = os.path.join(repo.git_dir, CACHE_DIR_NAME, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+def temp_path(path : str) -> str:
+    """
+    Create a uniquely named temporary file next to a cache file, to write the file to before moving it in place.
+    Concurrent writers (threads or processes) each get their own temporary file.
+
+    :param path: The cache file path.
+    """
+    fd, out = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    return out
+
+def is_binary(data : bytes) -> bool:
+    """
+    Check if file contents are binary.
+
+    :param data: The file contents.
+    """
+    return b"\0" in data[:BINARY_CHECK_SIZE]
+
+class KeyedLocks:
+
+    """
+    Locks per key, so concurrent callers that need the same item (such as the index of a commit)
+    wait for one of them to build it instead of each building it.
+    """
+
+    def __init__(self):
+        self._locks : dict[Hashable,list] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def hold(self, key : Hashable) -> Iterator[None]:
+        """
+        Hold the lock of a key.
+
+        :param key: The key.
+        """
+        with self._lock:
+            # lock and number of holders, the lock is removed once nobody holds or waits for it
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]: yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]: del self._locks[key]
+
+class IndexCache:
+
+    """
+    In-process LRU cache of the indexes of commits keyed by repository and commit SHA.
+    Concurrent callers that need an index that isn't cached wait for a single load or build.
+    """
+
+    def __init__(self, max_size : int):
+        """
+        :param max_size: The maximum number of cached indexes.
+        """
+        self.max_size = max_size
+        self._indexes : OrderedDict[Hashable,object] = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = KeyedLocks()
+
+    def get(self, key : Hashable, load : Callable[[], T]) -> T:
+        """
+        Get a cached index, load or build it on a cache miss.
+
+        :param key: The cache key.
+        :param load: Loads or builds the index.
+        """
+        index = self._cached(key)
+        if index is not None: return index
+        with self._build_locks.hold(key):
+            index = self._cached(key)
+            if index is not None: return index
+            index = load()
+            with self._lock:
+                self._indexes[key] = index
+                while len(self._indexes) > self.max_size: self._indexes.popitem(last=False)
+            return index
+
+    def _cached(self, key : Hashable) -> Optional[object]:
+        with self._lock:
+            if key not in self._indexes: return None
+            self._indexes.move_to_end(key)
+            return self._indexes[key]
+
+class BlobCache:
+
+    """
+    In-process LRU cache of blob contents keyed by blob SHA. Blobs are content addressed so
+    cached contents can be shared between commits and repositories.
+    """
+
+    def __init__(self, max_size : int = BLOB_CACHE_SIZE):
+        """
+        :param max_size: The maximum total size of cached blobs in bytes.
+        """
+        self.max_size = max_size
+        self.size = 0
+        self._blobs : OrderedDict[str,bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sha : str) -> Optional[bytes]:
+        """
+        Get cached blob contents.
+
+        :param sha: The blob SHA.
+        """
+        with self._lock:
+            data = self._blobs.get(sha)
+            if data is not None: self._blobs.move_to_end(sha)
+            return data
+
+    def put(self, sha : str, data : bytes):
+        """
+        Add blob contents to the cache, evicting the least recently used blobs if the cache is full.
+
+        :param sha: The blob SHA.
+        :param data: The blob contents.
+        """
+        if len(data) > self.max_size: return
+        with self._lock:
+            if sha in self._blobs: return
+            self._blobs[sha] = data
+            self.size += len(data)
+            while self.size > self.max_size:
+                _, evicted = self._blobs.popitem(last=False)
+                self.size -= len(evicted)
+
+    def read(self, repo : Repo, sha : str) -> bytes:
+        """
+        Get blob contents from the cache, read it from the repository on a cache miss.
+
+        :param repo: The repository containing the blob.
+        :param sha: The blob SHA.
+        """
+        data = self.get(sha)
+        if data is not None: return data
+        data = repo.odb.stream(bytes.fromhex(sha)).read()
+        self.put(sha, data)
+        return data
+
+BLOB_CACHE = BlobCache()
@@ -0,0 +1,140 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import sqlite3
+from typing import Iterator, Optional
+
+from git import Repo
+
+from .cache import cache_path
+
+LOG_FORMAT = "%x1e%H%x1f%an%x1f%ae%x1f%at%x1f%ct%x1f%B"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commits (
+    sha TEXT PRIMARY KEY, author TEXT, author_email TEXT,
+    authored_at INTEGER, committed_at INTEGER, message TEXT
+);
+CREATE INDEX IF NOT EXISTS commits_committed_at ON commits (committed_at);
+CREATE TABLE IF NOT EXISTS paths (sha TEXT, path TEXT);
+CREATE INDEX IF NOT EXISTS paths_path ON paths (path);
+CREATE TABLE IF NOT EXISTS tips (sha TEXT PRIMARY KEY);
+"""
+
+class IndexedCommit:
+
+    """ Commit metadata read from the commit index. """
+
+    def __init__(self, hexsha : str, author : str, author_email : str, authored_at : int, committed_at : int, message : str):
+        self.hexsha = hexsha
+        self.author = author
+        self.author_email = author_email
+        self.authored_datetime = datetime.fromtimestamp(authored_at, timezone.utc)
+        self.committed_datetime = datetime.fromtimestamp(committed_at, timezone.utc)
+        self.message = message
+
+class CommitIndex:
+
+    """
+    SQLite index of the commit metadata (SHA, author, dates, message and touched paths) of a repository.
+    The index is updated incrementally with only the commits that are not indexed yet, so history
+    queries don't have to walk and parse the commit graph. Commits that are no longer reachable from
+    any ref, such as after a force push, are dropped when the index is updated.
+    """
+
+    def __init__(self, repo : Repo):
+        """
+        :param repo: The repository.
+        """
+        self.repo = repo
+        self.path = cache_path(repo, "commits.sqlite")
+
+    def update(self, rev : str = "HEAD"):
+        """
+        Index the commits reachable from the given revision that aren't indexed yet, and drop the indexed commits
+        that are no longer reachable from it or any ref.
+
+        :param rev: The revision to index.
+        """
+        head = self.repo.commit(rev).hexsha
+        with self._connect() as conn:
+            # lock the database so concurrent processes don't index the same commits
+            conn.execute("BEGIN IMMEDIATE")
+            tips = list(map(lambda r: r[0], conn.execute("SELECT sha FROM tips")))
+            if head in tips: return
+            # history rewrites (force pushes) leave commits only reachable from old tips
+            dropped = self.repo.git.rev_list(*tips, "--not", "--all", head).split() if tips else []
+            if dropped:
+                self._drop(conn, dropped)
+                tips = list(filter(lambda t: t not in set(dropped), tips))
+            args = ["-z", "--name-only", "--no-renames", "--format=%s" % LOG_FORMAT, head]
+            if tips: args += ["--not"] + tips
+            for record in self.repo.git.log(*args).split("\x1e")[1:]:
+                header, _, names = record.partition("\0")
+                sha, author, author_email, authored_at, committed_at, message = header.split("\x1f", 5)
+                conn.execute("INSERT OR IGNORE INTO commits VALUES (?, ?, ?, ?, ?, ?)",
+                    (sha, author, author_email, int(authored_at), int(committed_at), message.strip()))
+                conn.executemany("INSERT INTO paths VALUES (?, ?)",
+                    map(lambda p: (sha, p), filter(None, names.lstrip("\n").split("\0"))))
+            # only keep tips that aren't already covered by the new tip
+            for tip in tips:
+                if self.repo.is_ancestor(tip, head): conn.execute("DELETE FROM tips WHERE sha = ?", (tip,))
+            conn.execute("INSERT INTO tips VALUES (?)", (head,))
+
+    def query(
+        self,
+        since : Optional[datetime] = None,
+        until : Optional[datetime] = None,
+        author : str = "",
+        path : str = "",
+        offset : int = 0,
+        limit : int = 50,
+        committed : bool = False
+    ) -> list[IndexedCommit]:
+        """
+        Find commits, most recently committed first.
+
+        :param since: Only include commits authored at or after this time.
+        :param until: Only include commits authored at or before this time.
+        :param author: Only include commits where the author name or email contains this string.
+        :param path: Only include commits that touched this file or a file inside this directory.
+        :param offset: Number of matching commits to skip.
+        :param limit: Maximum number of commits to return.
+        :param committed: Filter 'since' and 'until' on the commit time instead of the author time, the time the results are ordered by.
+        """
+        where, params = [], []
+        date_column = "c.committed_at" if committed else "c.authored_at"
+        if since:
+            where.append("%s >= ?" % date_column)
+            params.append(int(since.timestamp()))
+        if until:
+            where.append("%s <= ?" % date_column)
+            params.append(int(until.timestamp()))
+        if author:
+            where.append("(c.author LIKE ? OR c.author_email LIKE ?)")
+            params += ["%" + author + "%"] * 2
+        if path:
+            path = path.strip("/")
+            # range match on the path index, '0' is the character after '/'
+            where.append("c.sha IN (SELECT sha FROM paths WHERE path = ? OR (path >= ? AND path < ?))")
+            params += [path, path + "/", path + "0"]
+        sql = "SELECT c.sha, c.author, c.author_email, c.authored_at, c.committed_at, c.message FROM commits c"
+        if where: sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY c.committed_at DESC, c.rowid ASC LIMIT ? OFFSET ?"
+        with self._connect() as conn:
+            return list(map(lambda r: IndexedCommit(*r), conn.execute(sql, params + [limit, offset])))
+
+    @staticmethod
+    def _drop(conn : sqlite3.Connection, shas : list[str]):
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS dropped (sha TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM dropped")
+        conn.executemany("INSERT OR IGNORE INTO dropped VALUES (?)", map(lambda s: (s,), shas))
+        for table in ("commits", "paths", "tips"):
+            conn.execute("DELETE FROM %s WHERE sha IN (SELECT sha FROM dropped)" % table)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.executescript(SCHEMA)
+            with conn: yield conn
+        finally: conn.close()
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta, timezone
+import re
+from typing import Optional
+
+from git import BadName
+
+from ....error.bot import ToolPropertyInvalidError
+from ...property import PropertyDefinition, PropertyType
+from ..response import ToolMessageResponse
+from .base import BaseGitTool
+from .commit_index import CommitIndex
+
+EMPTY_TREE_SHA = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+MAX_FILES = 200
+MAX_FILE_PATCH_SIZE = 8192 # 8KB
+MAX_PATCH_SIZE = 65536 # 64KB
+
+class GitDiffTool(BaseGitTool):
+
+    @staticmethod
+    def name() -> str:
+        return "git-diff"
+
+    @staticmethod
+    def description(**kwargs):
+        return "List the files that changed between two commits or within a date range, with the number of added and removed lines. " + \
+            "Optionally include the unified diff of each file."
+
+    @staticmethod
+    def properties(**kwargs):
+        return BaseGitTool.properties() + [
+            PropertyDefinition("from_commit", description="The commit to compare from. Not needed if 'since' is provided."),
+            PropertyDefinition("to_commit", description="The commit to compare to, use the most recent commit (HEAD) if not provided."),
+            PropertyDefinition("since", description="Compare from the last commit before this date instead of 'from_commit'. Format: YYYY-MM-DD"),
+            PropertyDefinition("until", description="Compare to the last commit on or before this date instead of 'to_commit'. Format: YYYY-MM-DD"),
+            PropertyDefinition("path", description="Only include changes to this file or files in this directory."),
+            PropertyDefinition("patch", type=PropertyType.BOOL, description="Include the unified diff of each changed file, large diffs are truncated."),
+        ]
+
+    def execute(
+        self, repository : str, from_commit : str = "", to_commit : str = "HEAD", since : str = "", until : str = "",
+        path : str = "", patch : bool = False, *args, **kwargs
+    ):
+        super().execute(repository=repository, **kwargs)
+        if not from_commit and not since: raise ToolPropertyInvalidError(self.name(), "from_commit", "either 'from_commit' or 'since' is required")
+        if from_commit and since: raise ToolPropertyInvalidError(self.name(), "since", "use either 'from_commit' or 'since', not both")
+        from_sha = self._resolve_commit(from_commit, "from_commit") if not since else self._commit_before(since, "since", inclusive=False)
+        to_sha = self._resolve_commit(to_commit, "to_commit") if not until else self._commit_before(until, "until")
+        if not to_sha: return ToolMessageResponse("(no commits found before %s)" % until)
+        pathspec = ["--", path.strip("/")] if path.strip("/") else []
+
+        statuses = self._split_pairs(self.repo.git.diff("--name-status", "--no-renames", "-z", from_sha or EMPTY_TREE_SHA, to_sha, *pathspec))
+        if not statuses: return ToolMessageResponse("(no changes found)")
+        line_counts = {}
+        for line in self.repo.git.diff("--numstat", "--no-renames", "-z", from_sha or EMPTY_TREE_SHA, to_sha, *pathspec).split("\0"):
+            if line.count("\t") != 2: continue
+            added, removed, changed_path = line.split("\t")
+            line_counts[changed_path] = (added, removed)
+
+        out = ["FROM: %s" % (from_sha or "(empty repository)"), "TO: %s" % to_sha, "CHANGED FILES: %d" % len(statuses), ""]
+        for status, changed_path in statuses[:MAX_FILES]:
+            added, removed = line_counts.get(changed_path, ("-", "-"))
+            stats = "+%s -%s" % (added, removed) if added != "-" else "(binary)"
+            out.append("%s %s %s" % (status, stats, changed_path))
+        if len(statuses) > MAX_FILES:
+            out.append("(%d more files not shown, use 'path' to narrow down the changes)" % (len(statuses) - MAX_FILES))
+        if patch: out += self._patches(from_sha or EMPTY_TREE_SHA, to_sha, map(lambda s: s[1], statuses[:MAX_FILES]))
+        return ToolMessageResponse("\n".join(out))
+
+    def _patches(self, from_sha : str, to_sha : str, paths) -> list[str]:
+        out = []
+        total = 0
+        # a single diff of all the listed files, split in to the patch of each file at its header
+        diff = self.repo.git.diff("--no-renames", "-z", from_sha, to_sha, "--", *map(lambda p: ":(literal)%s" % p, paths))
+        for file_patch in re.split(r"^(?=diff --git )", diff, flags=re.MULTILINE):
+            file_patch = file_patch.rstrip("\n")
+            if not file_patch: continue
+            if len(file_patch) > MAX_FILE_PATCH_SIZE:
+                file_patch = file_patch[:MAX_FILE_PATCH_SIZE] + "\n(diff truncated)"
+            if total + len(file_patch) > MAX_PATCH_SIZE:
+                out += ["", "(diff size limit reached, remaining files omitted, use 'path' to view them)"]
+                break
+            total += len(file_patch)
+            out += ["", file_patch]
+        return out
+
+    def _resolve_commit(self, rev : str, property_name : str) -> str:
+        try: return self.repo.commit(rev).hexsha
+        except (BadName, ValueError) as e:
+            self._log_error("Error occured trying to resolve commit.", e, {"git_commit": rev})
+            raise ToolPropertyInvalidError(self.name(), property_name)
+
+    def _commit_before(self, date : str, property_name : str, inclusive : bool = True) -> Optional[str]:
+        """ The most recent commit committed before the given date, the end of the day is included if inclusive. """
+        try: until = datetime.strptime(date, "%Y-%m-%d").astimezone(timezone.utc)
+        except ValueError: raise ToolPropertyInvalidError(self.name(), property_name, "expected date format YYYY-MM-DD")
+        until += timedelta(days=1) if inclusive else timedelta()
+        index = CommitIndex(self.repo)
+        index.update()
+        # rebased or merged commits can be authored long before they are committed, filter on the time the results are ordered by
+        commits = index.query(until=until - timedelta(seconds=1), limit=1, committed=True)
+        return commits[0].hexsha if commits else None
+
+    @staticmethod
+    def _split_pairs(output : str) -> list[tuple[str,str]]:
+        tokens = output.split("\0")
+        return list(filter(lambda p: p[1], zip(tokens[0::2], tokens[1::2])))
@@ -1,8 +1,9 @@
-from ...property import PropertyDefinition
+from ...property import PropertyDefinition, PropertyType
 from ..response import ToolMessageResponse
 from .base import BaseGitTool
+from .commit_index import CommitIndex
 
-MAX_FILE_SIZE = 131072 # 128KB
+LIMIT = 50
 
 class GitFileHistoryTool(BaseGitTool):
 
@@ -11,19 +12,21 @@ class GitFileHistoryTool(BaseGitTool):
         return "git-file-history"
 
     @staticmethod
-    def description():
-        return "Show the commit history of a file in the repository."
+    def description(**kwargs):
+        return "Show the commit history of a file in the repository, %d commits at a time, most recent first." % LIMIT
 
     @staticmethod
-    def properties():
+    def properties(**kwargs):
         return BaseGitTool.properties() + [
-            PropertyDefinition("file", description="The file to view the history of.", required=True)
+            PropertyDefinition("file", description="The file to view the history of.", required=True),
+            PropertyDefinition("page", type=PropertyType.INT, description="The page of results to show, the first page if not provided.", min=1)
         ]
 
-    def execute(self, repository : str, file : str, *args, **kwargs):
+    def execute(self, repository : str, file : str, page : int = 1, *args, **kwargs):
         super().execute(repository=repository, **kwargs)
-        out = ""
-        for commit in self.repo.iter_commits(paths=file):
-            out += self._display_commit(commit) + "\n"
-        out = out.strip()
-        return ToolMessageResponse(out if out else "(no commits found)")    
+        index = CommitIndex(self.repo)
+        index.update()
+        commits = index.query(path=file, offset=(page - 1) * LIMIT, limit=LIMIT + 1)
+        out = "\n\n".join(map(self._display_commit, commits[:LIMIT]))
+        if len(commits) > LIMIT: out += "\n\n(more commits available, use page %d)" % (page + 1)
+        return ToolMessageResponse(out if out else "(no commits found)")
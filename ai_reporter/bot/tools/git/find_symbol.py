@@ -0,0 +1,40 @@
+from git import BadName
+
+from ....error.bot import ToolPropertyInvalidError
+from ...property import PropertyDefinition
+from ..response import ToolMessageResponse
+from .base import BaseGitTool
+from .symbols import SymbolIndex
+
+LIMIT = 50
+
+class GitFindSymbolTool(BaseGitTool):
+
+    @staticmethod
+    def name() -> str:
+        return "git-find-symbol"
+
+    @staticmethod
+    def description(**kwargs):
+        return "Find where classes, functions and methods are defined in the repository. Returns up to %d definitions formatted as path:line kind name." % LIMIT
+
+    @staticmethod
+    def properties(**kwargs):
+        return BaseGitTool.properties() + [
+            PropertyDefinition("symbol", description="The name of the class, function or method to find, wildcards are supported.", required=True),
+            PropertyDefinition("commit",
+                description="The commit to base the search in, use the most recent commit (HEAD) if not provided."),
+        ]
+
+    def execute(self, repository : str, symbol : str, commit : str = "HEAD", *args, **kwargs):
+        super().execute(repository=repository, **kwargs)
+        try:
+            commit_obj = self.repo.commit(commit)
+            results = SymbolIndex(self.repo).find(commit_obj, symbol, LIMIT + 1)
+        except BadName as e:
+            self._log_error("Error occured when trying to find symbol.", e, {"symbol_name": symbol, "git_repository": repository, "git_commit": commit})
+            raise ToolPropertyInvalidError(self.name(), "commit")
+        if not results: return ToolMessageResponse("(no symbols found)")
+        out = "\n".join(map(lambda r: "%s:%d %s %s" % (r[0], r[1].line, r[1].kind, r[1].qualified_name), results[:LIMIT]))
+        if len(results) > LIMIT: out += "\n(results limited to the first %d definitions)" % LIMIT
+        return ToolMessageResponse(out)
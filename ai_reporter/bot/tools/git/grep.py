@@ -0,0 +1,59 @@
+from typing import Iterable, Iterator, Optional
+
+from git import GitCommandError, Repo
+
+MAX_SNIPPET_LENGTH = 200
+
+class GrepMatch:
+
+    """ A line matched by a search. """
+
+    def __init__(self, path : str, line : int, text : str):
+        self.path = path
+        self.line = line
+        self.text = text
+
+    def __str__(self):
+        snippet = self.text.strip()
+        if len(snippet) > MAX_SNIPPET_LENGTH: snippet = snippet[:MAX_SNIPPET_LENGTH] + "..."
+        return "%s:%d:%s" % (self.path, self.line, snippet)
+
+def grep(
+    repo : Repo,
+    commit_sha : str,
+    pattern : str,
+    regex : bool = False,
+    ignore_case : bool = False,
+    paths : Optional[Iterable[str]] = None
+) -> Iterator[GrepMatch]:
+    """
+    Search the blobs of a commit with `git grep`, which scans the object database with multiple threads
+    and skips binary files. Matches are yielded as they are found, the search process is stopped
+    when the iterator is closed.
+
+    :param repo: The repository.
+    :param commit_sha: The commit to search.
+    :param pattern: The string or extended regular expression to search for.
+    :param regex: Treat the pattern as an extended regular expression instead of a fixed string.
+    :param ignore_case: Perform a case insensitive search.
+    :param paths: Optional list of file paths to limit the search to.
+    """
+    args = ["-n", "-z", "-I", "-E" if regex else "-F"]
+    if ignore_case: args.append("-i")
+    args += ["-e", pattern, commit_sha]
+    if paths is not None: args += ["--"] + [":(literal)%s" % path for path in paths]
+    # keep a reference to the auto interrupt wrapper, it kills the process when garbage collected
+    handle = repo.git.grep(*args, as_process=True)
+    process = handle.proc
+    prefix_length = len(commit_sha) + 1
+    try:
+        for line in process.stdout:
+            path, line_no, text = line[prefix_length:].rstrip(b"\n").split(b"\0", 2)
+            yield GrepMatch(path.decode("utf-8", "replace"), int(line_no), text.decode("utf-8", "replace"))
+        # exit status 1 means nothing was found
+        if process.wait() > 1:
+            raise GitCommandError(["git", "grep"], process.returncode, process.stderr.read())
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
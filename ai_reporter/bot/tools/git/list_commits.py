@@ -1,8 +1,10 @@
 from datetime import datetime, timezone
-from itertools import islice
-from ...property import PropertyDefinition
+
+from ....error.bot import ToolPropertyInvalidError
+from ...property import PropertyDefinition, PropertyType
 from ..response import ToolMessageResponse
 from .base import BaseGitTool
+from .commit_index import CommitIndex
 
 LIMIT = 50
 
@@ -13,23 +15,35 @@ class GitListCommitsTool(BaseGitTool):
         return "git-list-commits"
 
     @staticmethod
-    def description():
-        return "List %d commits in the repository." % LIMIT
+    def description(**kwargs):
+        return "List %d commits in the repository, most recent first." % LIMIT
 
     @staticmethod
-    def properties():
+    def properties(**kwargs):
         return BaseGitTool.properties() + [
-            PropertyDefinition("until", description="If provided, list first %d commits that occured before the date, otherwise list most recent commits. Format: YYYY-MM-DD" % LIMIT)
+            PropertyDefinition("until", description="If provided, list first %d commits that occured before the date, otherwise list most recent commits. Format: YYYY-MM-DD" % LIMIT),
+            PropertyDefinition("since", description="If provided, only list commits that occured on or after the date. Format: YYYY-MM-DD"),
+            PropertyDefinition("author", description="If provided, only list commits where the author name or email contains this string."),
+            PropertyDefinition("path", description="If provided, only list commits that changed this file or a file in this directory."),
+            PropertyDefinition("page", type=PropertyType.INT, description="The page of results to show, the first page if not provided.", min=1)
         ]
 
-    def execute(self, repository : str, until : str = "", *args, **kwargs):
+    def execute(self, repository : str, until : str = "", since : str = "", author : str = "", path : str = "", page : int = 1, *args, **kwargs):
         super().execute(repository=repository, **kwargs)
-        out = ""
-        commits = self.repo.iter_commits()
-        if until:
-            until_dt = datetime.strptime(until, "%Y-%m-%d").astimezone(timezone.utc)
-            commits = filter(lambda c: c.authored_datetime <= until_dt, commits)
-        for commit in islice(commits, LIMIT):
-            out += self._display_commit(commit) + "\n"
-        out = out.strip()
-        return ToolMessageResponse(out if out else "(no commits found)")    
+        index = CommitIndex(self.repo)
+        index.update()
+        commits = index.query(
+            since=self._parse_date(since, "since") if since else None,
+            until=self._parse_date(until, "until") if until else None,
+            author=author,
+            path=path,
+            offset=(page - 1) * LIMIT,
+            limit=LIMIT + 1
+        )
+        out = "\n\n".join(map(self._display_commit, commits[:LIMIT]))
+        if len(commits) > LIMIT: out += "\n\n(more commits available, use page %d)" % (page + 1)
+        return ToolMessageResponse(out if out else "(no commits found)")
+
+    def _parse_date(self, value : str, property_name : str) -> datetime:
+        try: return datetime.strptime(value, "%Y-%m-%d").astimezone(timezone.utc)
+        except ValueError: raise ToolPropertyInvalidError(self.name(), property_name, "expected date format YYYY-MM-DD")
@@ -1,9 +1,10 @@
-from git import BadName, Blob, Tree
+from git import BadName
 
 from ....error.bot import ToolPropertyInvalidError
 from ...property import PropertyDefinition
 from ..response import ToolMessageResponse
 from .base import BaseGitTool
+from .path_index import PathIndex
 
 class GitListDirTool(BaseGitTool):
 
@@ -12,11 +13,11 @@ class GitListDirTool(BaseGitTool):
         return "git-list-dir"
 
     @staticmethod
-    def description():
+    def description(**kwargs):
         return "List all files for a given directory in the repository."
 
     @staticmethod
-    def properties():
+    def properties(**kwargs):
         return BaseGitTool.properties() + [
             PropertyDefinition("path", description="The path of the directory to list, use the root directory if not provided."),
             PropertyDefinition("commit", 
@@ -27,17 +28,10 @@ class GitListDirTool(BaseGitTool):
         super().execute(repository=repository, **kwargs)
         try:
             commit_obj = self.repo.commit(commit)
-            dir_list = self._search_tree(path, commit_obj.tree)
+            dir_list = PathIndex.for_commit(commit_obj).list_dir(path)
             return ToolMessageResponse(
-                "\n".join(list(set(dir_list))) if dir_list else "(empty directory)"
+                "\n".join(sorted(dir_list)) if dir_list else "(empty directory)"
             )
         except BadName as e:
             self._log_error("Error occured trying to list directory.", e, {"git_repository": repository, "git_path": path, "git_commit": commit})
             raise ToolPropertyInvalidError(self.name(), "commit")
-
-    def _search_tree(self, path : str, tree : Tree) -> list[str]:
-        out = []
-        for item in tree.traverse():
-            if isinstance(item, Tree) or isinstance(item, Blob):
-                if item.path == (path.strip("/") + "/" + item.name).lstrip("/"): out.append(item.path)
-        return out
@@ -0,0 +1,39 @@
+from git import BadName
+
+from ....error.bot import ToolPropertyInvalidError
+from ...property import PropertyDefinition
+from ..response import ToolMessageResponse
+from .base import BaseGitTool
+from .symbols import SymbolIndex
+
+class GitOutlineFileTool(BaseGitTool):
+
+    @staticmethod
+    def name() -> str:
+        return "git-outline-file"
+
+    @staticmethod
+    def description(**kwargs):
+        return "List the classes, functions and methods defined in a file with their line numbers, without reading the whole file."
+
+    @staticmethod
+    def properties(**kwargs):
+        return BaseGitTool.properties() + [
+            PropertyDefinition("file", description="The file to outline.", required=True),
+            PropertyDefinition("commit",
+                description="The commit to base the search in, use the most recent commit (HEAD) if not provided."),
+        ]
+
+    def execute(self, repository : str, file : str, commit : str = "HEAD", *args, **kwargs):
+        super().execute(repository=repository, **kwargs)
+        try:
+            commit_obj = self.repo.commit(commit)
+            symbols = SymbolIndex(self.repo).outline(commit_obj, file)
+        except BadName as e:
+            self._log_error("Error occured trying to outline file.", e, {"git_repository": repository, "git_file": file, "git_commit": commit})
+            raise ToolPropertyInvalidError(self.name(), "commit")
+        if symbols is None: return ToolMessageResponse("(file not found or language not supported)")
+        if not symbols: return ToolMessageResponse("(no symbols found)")
+        return ToolMessageResponse("\n".join(map(
+            lambda s: "%s%d %s %s" % ("  " * (s.container.count(".") + 1 if s.container else 0), s.line, s.kind, s.name), symbols
+        )))
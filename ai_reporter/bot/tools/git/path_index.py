@@ -0,0 +1,113 @@
+from fnmatch import fnmatch
+import json
+import os
+from typing import Optional, Self
+
+from git import Blob, Commit, Tree
+
+from .cache import IndexCache, cache_path, temp_path
+
+INDEX_VERSION = 1
+MEMORY_CACHE_SIZE = 8
+
+class PathIndex:
+
+    """
+    Index of every directory and file in the tree of a single commit. Built once per commit SHA
+    and persisted in the repository cache so directory listings and file name searches are lookups
+    instead of full tree traversals.
+    """
+
+    _memory_cache = IndexCache(MEMORY_CACHE_SIZE)
+
+    def __init__(self, commit_sha : str, dirs : dict[str,list[str]], files : dict[str,str]):
+        """
+        :param commit_sha: The SHA of the indexed commit.
+        :param dirs: Map of directory path (root is an empty string) to the paths of its children.
+        :param files: Map of file path to blob SHA.
+        """
+        self.commit_sha = commit_sha
+        self.dirs = dirs
+        self.files = files
+        self.names : dict[str,list[str]] = {}
+        for path in self.files.keys():
+            self.names.setdefault(os.path.basename(path), []).append(path)
+
+    @classmethod
+    def for_commit(cls, commit : Commit) -> Self:
+        """
+        Get the path index for the given commit, load it from the cache or build it if needed.
+
+        :param commit: The commit to index.
+        """
+        # concurrent callers (warm up and tool calls) wait for a single build
+        return cls._memory_cache.get((commit.repo.git_dir, commit.hexsha), lambda: cls._load_or_build(commit))
+
+    @classmethod
+    def _load_or_build(cls, commit : Commit) -> Self:
+        path = cache_path(commit.repo, "path_index", "%s.json" % commit.hexsha)
+        index = cls._load(path)
+        if not index or index.commit_sha != commit.hexsha:
+            index = cls.build(commit)
+            index._save(path)
+        return index
+
+    @classmethod
+    def build(cls, commit : Commit) -> Self:
+        """
+        Build the path index by traversing the commit tree.
+
+        :param commit: The commit to index.
+        """
+        dirs : dict[str,list[str]] = {"": []}
+        files : dict[str,str] = {}
+        for item in commit.tree.traverse():
+            if isinstance(item, Tree):
+                dirs.setdefault(item.path, [])
+            elif isinstance(item, Blob):
+                files[item.path] = item.hexsha
+            else: continue
+            dirs.setdefault(os.path.dirname(item.path), []).append(item.path)
+        return cls(commit.hexsha, dirs, files)
+
+    def list_dir(self, path : str) -> Optional[list[str]]:
+        """
+        List the paths of the files and directories inside a directory.
+
+        :param path: The directory path, the root directory if empty.
+        """
+        return self.dirs.get(path.strip("/"))
+
+    def search(self, pattern : str) -> list[str]:
+        """
+        Find files whose name matches the given wildcard pattern.
+
+        :param pattern: The file name pattern.
+        """
+        out = []
+        for name, paths in self.names.items():
+            if fnmatch(name, pattern): out += paths
+        return out
+
+    def blob_sha(self, path : str) -> Optional[str]:
+        """
+        Get the blob SHA of a file.
+
+        :param path: The file path.
+        """
+        return self.files.get(path.lstrip("/"))
+
+    @classmethod
+    def _load(cls, path : str) -> Optional[Self]:
+        if not os.path.exists(path): return None
+        try:
+            with open(path, "r") as f: data = json.load(f)
+        except (OSError, ValueError): return None
+        if data.get("version") != INDEX_VERSION: return None
+        return cls(data["commit"], data["dirs"], data["files"])
+
+    def _save(self, path : str):
+        tmp_path = temp_path(path)
+        with open(tmp_path, "w") as f:
+            json.dump({"version": INDEX_VERSION, "commit": self.commit_sha, "dirs": self.dirs, "files": self.files}, f)
+        os.replace(tmp_path, path)
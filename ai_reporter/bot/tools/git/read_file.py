@@ -1,46 +1,102 @@
-from git import BadName, Blob, Optional, Tree
+from typing import Optional
+
+from git import BadName, Blob, Tree
 
 from ....error.bot import ToolPropertyInvalidError
-from ...property import PropertyDefinition
+from ...property import PropertyDefinition, PropertyType
 from ..response import ToolMessageResponse
 from .base import BaseGitTool
+from .cache import BLOB_CACHE, is_binary
+
+MAX_FILE_SIZE = 32768 # 32KB
+
+def format_lines(file : str, contents : str, start_line : int = 1, end_line : int = 0, max_size : int = MAX_FILE_SIZE) -> str:
+    """
+    Format a range of lines of a file with line numbers and a header with the total number of lines.
+    Output stops at the last full line within the size limit and tells the bot where to continue reading.
+
+    :param file: The file path.
+    :param contents: The file contents.
+    :param start_line: The first line to include.
+    :param end_line: The last line to include, the end of the file if zero.
+    :param max_size: The maximum size of the formatted lines in bytes.
+    """
+    lines = contents.splitlines()
+    end_line = min(end_line, len(lines)) if end_line else len(lines)
+    width = len(str(end_line))
+    out = []
+    size = 0
+    line_no = start_line
+    while line_no <= end_line:
+        line = "%s| %s" % (str(line_no).rjust(width), lines[line_no - 1])
+        size += len(line.encode("utf-8")) + 1
+        if size > max_size:
+            if out: break
+            # a single line over the limit, such as in minified files, is cut off
+            line = line.encode("utf-8")[:max_size].decode("utf-8", "ignore") + " (line truncated)"
+        out.append(line)
+        line_no += 1
+    header = "FILE: %s\nLINES: %d-%d of %d" % (file, start_line, line_no - 1, len(lines)) if out else \
+        "FILE: %s\nLINES: (none) of %d" % (file, len(lines))
+    if line_no <= end_line:
+        out.append("(output limited to %d bytes, continue reading with start_line=%d)" % (max_size, line_no))
+    return "\n".join([header] + out)
 
-MAX_FILE_SIZE = 131072 # 128KB
+def format_file(file : str, data : bytes, start_line : int = 1, end_line : int = 0, max_size : int = MAX_FILE_SIZE) -> str:
+    """
+    Format a range of lines of a file like `format_lines`, binary files are only described by their size.
+
+    :param file: The file path.
+    :param data: The file contents.
+    :param start_line: The first line to include.
+    :param end_line: The last line to include, the end of the file if zero.
+    :param max_size: The maximum size of the formatted lines in bytes.
+    """
+    if is_binary(data): return "FILE: %s\n(binary file, %d bytes)" % (file, len(data))
+    return format_lines(file, data.decode("utf-8", "replace"), start_line, end_line, max_size)
 
 class GitReadFileTool(BaseGitTool):
 
+    def __init__(self, max_read_size : int = MAX_FILE_SIZE, **kwargs):
+        super().__init__(**kwargs)
+        self._check_config_type(max_read_size, int, "tools.git.max_read_size")
+        self.max_read_size = max_read_size
+
     @staticmethod
     def name() -> str:
         return "git-read-file"
 
     @staticmethod
-    def description():
-        return "Read the contents of a file in the repostory."
+    def description(max_read_size : int = MAX_FILE_SIZE, **kwargs):
+        return "Read the contents of a file in the repostory. Lines are numbered and at most %d bytes are returned per call, " % max_read_size + \
+            "use 'start_line' and 'end_line' to read other parts of large files."
 
     @staticmethod
-    def properties():
+    def properties(**kwargs):
         return BaseGitTool.properties() + [
             PropertyDefinition("file", description="The file to read.", required=True),
-            PropertyDefinition("commit", 
+            PropertyDefinition("commit",
                 description="The commit to base the search in, use the most recent commit (HEAD) if not provided."),
+            PropertyDefinition("start_line", type=PropertyType.INT, description="The first line to read, the start of the file if not provided.", min=1),
+            PropertyDefinition("end_line", type=PropertyType.INT, description="The last line to read, the end of the file if not provided.", min=1),
         ]
 
-    def execute(self, repository : str, file : str, commit : str = "HEAD", *args, **kwargs):
+    def execute(self, repository : str, file : str, commit : str = "HEAD", start_line : int = 1, end_line : int = 0, *args, **kwargs):
         super().execute(repository=repository, **kwargs)
-        out = ""
+        if end_line and end_line < start_line: raise ToolPropertyInvalidError(self.name(), "end_line", "'end_line' is before 'start_line'")
+        out = None
         try:
             commit_obj = self.repo.commit(commit)
             out = self._search_tree(file, commit_obj.tree)
         except BadName as e:
             self._log_error("Error occured trying to read file.", e, {"git_repository": repository, "git_file": file, "git_commit": commit})
             raise ToolPropertyInvalidError(self.name(), "commit")
-        return ToolMessageResponse(out if out else "(file not found)")
-
-    def _search_tree(self, file : str, tree : Tree) -> Optional[str]:
-        for item in tree.traverse():
-            if isinstance(item, Blob):
-                if item.path == file.lstrip("/"):
-                    return bytes(item.data_stream.read()).decode("utf-8")
-        return None
-
+        if out is None: return ToolMessageResponse("(file not found)")
+        return ToolMessageResponse(format_file(file.strip("/"), out, start_line, end_line, self.max_read_size))
 
+    def _search_tree(self, file : str, tree : Tree) -> Optional[bytes]:
+        # descend only the tree entries on the requested path
+        try: item = tree / file.strip("/")
+        except KeyError: return None
+        if not isinstance(item, Blob): return None
+        return BLOB_CACHE.read(self.repo, item.hexsha)
@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+import re
+import threading
+from typing import Optional
+
+from git import BadName, Repo
+
+from ....error.bot import ToolPropertyInvalidError
+from ...property import PropertyDefinition, PropertyType
+from ..response import ToolMessageResponse
+from .base import BaseGitTool
+from .cache import BLOB_CACHE
+from .path_index import PathIndex
+from .read_file import MAX_FILE_SIZE, format_file
+from .repository import fetch_missing_blobs
+
+MAX_FILES = 20
+MAX_BATCH_SIZE = 98304 # 96KB
+MAX_WORKERS = 8
+
+LINE_RANGE_PATTERN = re.compile(r"^(?P<path>.+?)(?::(?P<start>\d+)(?:-(?P<end>\d*))?)?$")
+
+class GitReadFilesTool(BaseGitTool):
+
+    def __init__(self, max_read_size : int = MAX_FILE_SIZE, max_batch_read_size : int = MAX_BATCH_SIZE, **kwargs):
+        super().__init__(**kwargs)
+        self._check_config_type(max_read_size, int, "tools.git.max_read_size")
+        self._check_config_type(max_batch_read_size, int, "tools.git.max_batch_read_size")
+        self.max_read_size = max_read_size
+        self.max_batch_read_size = max_batch_read_size
+
+    @staticmethod
+    def name() -> str:
+        return "git-read-files"
+
+    @staticmethod
+    def description(max_read_size : int = MAX_FILE_SIZE, max_batch_read_size : int = MAX_BATCH_SIZE, **kwargs):
+        return "Read the contents of up to %d files in the repository at once, prefer this over multiple calls to git-read-file. " % MAX_FILES + \
+            "Lines are numbered, at most %d bytes are returned per file and %d bytes in total." % (max_read_size, max_batch_read_size)
+
+    @staticmethod
+    def properties(**kwargs):
+        return BaseGitTool.properties() + [
+            PropertyDefinition("files", type=PropertyType.LIST,
+                description="The files to read. Append a line range to read part of a file, for example 'src/main.py:120-180'.", required=True),
+            PropertyDefinition("commit",
+                description="The commit to base the search in, use the most recent commit (HEAD) if not provided."),
+        ]
+
+    def execute(self, repository : str, files : list[str], commit : str = "HEAD", *args, **kwargs):
+        super().execute(repository=repository, **kwargs)
+        if not files: raise ToolPropertyInvalidError(self.name(), "files", "at least one file is required")
+        if len(files) > MAX_FILES: raise ToolPropertyInvalidError(self.name(), "files", "at most %d files can be read at once" % MAX_FILES)
+        requests = list(map(self._parse_file, files))
+        try:
+            commit_obj = self.repo.commit(commit)
+            path_index = PathIndex.for_commit(commit_obj)
+        except BadName as e:
+            self._log_error("Error occured trying to read files.", e, {"git_repository": repository, "git_files": files, "git_commit": commit})
+            raise ToolPropertyInvalidError(self.name(), "commit")
+        shas = list(map(lambda r: path_index.blob_sha(r[0]), requests))
+        # fetch the blobs of partial clones in one request instead of one per file
+        fetch_missing_blobs(self.repo, commit_obj.hexsha, filter(None, shas))
+        contents = self._read_blobs(shas)
+
+        out = []
+        remaining = self.max_batch_read_size
+        for (path, start_line, end_line), data in zip(requests, contents):
+            if data is None:
+                out.append("FILE: %s\n(file not found)" % path)
+            elif remaining <= 0:
+                out.append("FILE: %s\n(not read, total output limited to %d bytes, read it in another call)" % (path, self.max_batch_read_size))
+            else:
+                text = format_file(path, data, start_line, end_line, min(self.max_read_size, remaining))
+                remaining -= len(text.encode("utf-8"))
+                out.append(text)
+        return ToolMessageResponse("\n\n".join(out))
+
+    def _read_blobs(self, shas : list[Optional[str]]) -> list[Optional[bytes]]:
+        """ Read blobs concurrently, each worker thread uses its own repository handle. """
+        local = threading.local()
+        handles : list[Repo] = []
+        def read(sha : Optional[str]) -> Optional[bytes]:
+            if not sha: return None
+            data = BLOB_CACHE.get(sha)
+            if data is not None: return data
+            if not hasattr(local, "repo"):
+                local.repo = Repo(self.repo.git_dir)
+                handles.append(local.repo)
+            return BLOB_CACHE.read(local.repo, sha)
+        try:
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(shas))) as executor:
+                return list(executor.map(read, shas))
+        finally:
+            for handle in handles: handle.close()
+
+    def _parse_file(self, file : str) -> tuple[str,int,int]:
+        """ Split a 'path:start-end' file argument into the path and line range. """
+        match = LINE_RANGE_PATTERN.match(file.strip()) if isinstance(file, str) else None
+        if not match: raise ToolPropertyInvalidError(self.name(), "files", "invalid file '%s'" % file)
+        start_line = int(match.group("start") or 1)
+        end_line = int(match.group("end") or (start_line if match.group("end") is None and match.group("start") else 0))
+        if start_line < 1 or (end_line and end_line < start_line):
+            raise ToolPropertyInvalidError(self.name(), "files", "invalid line range in '%s'" % file)
+        return match.group("path").strip("/"), start_line, end_line
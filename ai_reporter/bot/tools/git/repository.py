@@ -0,0 +1,256 @@
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Iterable, Iterator, Optional
+
+from git import GitCommandError, Repo
+
+from ..base import WORK_PATH
+
+try:
+    import fcntl
+except ImportError: # pragma: no cover
+    fcntl = None
+
+DEFAULT_FETCH_INTERVAL = 300 # 5 minutes
+FETCH_BATCH_SIZE = 1000
+
+class RepositoryManager:
+
+    """
+    Keeps cloned repositories in the work directory and hands out open repository handles keyed by URL.
+    Each repository is updated from its remote at most once per fetch interval, across every report
+    run by the process.
+
+    Clones live in URL hashed directories and are guarded by per repository file locks so multiple processes
+    can share the work directory. Least recently used clones are evicted when the work directory grows
+    past the disk budget, clones in use by any process are kept.
+    """
+
+    def __init__(self, work_path : str = WORK_PATH):
+        """
+        :param work_path: The directory to clone repositories in to.
+        """
+        self.work_path = work_path
+        self._last_fetch : dict[str,float] = {}
+        self._locks : dict[str,threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        # GitPython repository handles are not thread safe, each thread gets its own
+        self._local = threading.local()
+
+    def open(
+        self,
+        url : str,
+        fetch_interval : int = DEFAULT_FETCH_INTERVAL,
+        max_disk_usage : int = 0,
+        clone_filter : str = "",
+        clone_depth : int = 0,
+        clone_single_branch : bool = False
+    ) -> Repo:
+        """
+        Get an open handle for the repository at the given URL, cloning it if needed and
+        updating it if it was last fetched longer ago than the fetch interval.
+
+        :param url: The repository URL.
+        :param fetch_interval: The minimum number of seconds between fetches.
+        :param max_disk_usage: Disk budget for all cloned repositories in bytes, no limit if zero.
+        :param clone_filter: Partial clone filter (i.e. 'blob:none'), missing objects are fetched on demand.
+        :param clone_depth: Only clone this many commits of history, full history if zero.
+        :param clone_single_branch: Only clone the history of the default branch.
+        """
+        with self._lock(url):
+            path = self.path(url)
+            repo = self._handles().get(url)
+            # repository may have been evicted by another process
+            if repo and not os.path.exists(path): repo = None
+            changed = False
+            if not repo:
+                with self._file_lock(url):
+                    if not os.path.exists(path):
+                        self._clone(url, path, clone_filter, clone_depth, clone_single_branch)
+                        changed = True
+                repo = Repo(path)
+                self._handles()[url] = repo
+            if time.time() - self._last_fetch.get(url, 0) >= fetch_interval:
+                with self._file_lock(url):
+                    # another process may have fetched recently
+                    if time.time() - self._metadata(url).get("fetched_at", 0) >= fetch_interval:
+                        self._update(repo)
+                        self._write_metadata(url, self._dir_size(path))
+                        changed = True
+                self._last_fetch[url] = time.time()
+            self._touch(url)
+        if changed and max_disk_usage > 0:
+            # the caller is about to use the clone, don't evict it
+            with self._file_lock(url, shared=True, suffix=".use"): self.evict(max_disk_usage)
+        return repo
+
+    @contextmanager
+    def use(
+        self,
+        url : str,
+        fetch_interval : int = DEFAULT_FETCH_INTERVAL,
+        max_disk_usage : int = 0,
+        clone_filter : str = "",
+        clone_depth : int = 0,
+        clone_single_branch : bool = False
+    ) -> Iterator[Repo]:
+        """
+        Open the repository like `open` and keep the clone from being evicted by any process until the context exits.
+        Takes the same parameters as `open`.
+        """
+        # a shared lock on the clone's use lock file, eviction needs the exclusive lock
+        with self._file_lock(url, shared=True, suffix=".use"):
+            yield self.open(url, fetch_interval, max_disk_usage, clone_filter, clone_depth, clone_single_branch)
+
+    def path(self, url : str) -> str:
+        """
+        The path the repository at the given URL is cloned to.
+
+        :param url: The repository URL.
+        """
+        name = re.sub(r"[^\w.-]", "_", os.path.basename(url.rstrip("/")))
+        return os.path.join(self.work_path, "repos", "%s-%s" % (name, hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]))
+
+    def evict(self, max_disk_usage : int):
+        """
+        Delete least recently used clones until the total size of all clones is within the disk budget.
+        Clones in use or locked by another process are skipped.
+
+        :param max_disk_usage: Disk budget in bytes.
+        """
+        repos_path = os.path.join(self.work_path, "repos")
+        entries = []
+        for filename in os.listdir(repos_path):
+            if not filename.endswith(".json"): continue
+            metadata_path = os.path.join(repos_path, filename)
+            try:
+                with open(metadata_path, "r") as f: metadata = json.load(f)
+                entries.append((os.path.getmtime(metadata_path), metadata))
+            except (OSError, ValueError): continue
+        total = sum(map(lambda e: e[1].get("size", 0), entries))
+        for _, metadata in sorted(entries, key=lambda e: e[0]):
+            if total <= max_disk_usage: break
+            url = metadata["url"]
+            with self._lock(url), self._file_lock(url, blocking=False) as locked, \
+                self._file_lock(url, blocking=False, suffix=".use") as unused:
+                if not locked or not unused: continue
+                shutil.rmtree(self.path(url), ignore_errors=True)
+                os.remove(self._metadata_path(url))
+                # processes waiting for the locks notice the files are gone and lock new ones
+                for suffix in (".lock", ".use"):
+                    try: os.remove(self.path(url) + suffix)
+                    except OSError: pass
+            total -= metadata.get("size", 0)
+
+    def _clone(self, url : str, path : str, clone_filter : str = "", clone_depth : int = 0, clone_single_branch : bool = False):
+        # tools only read from the object database, skip the checkout so a partial clone doesn't fetch every blob
+        kwargs : dict[str,object] = {"no_checkout": True}
+        if clone_filter: kwargs["filter"] = clone_filter
+        if clone_depth: kwargs["depth"] = clone_depth
+        if clone_single_branch: kwargs["single_branch"] = True
+        # clone to a temporary directory so an interrupted clone never looks complete
+        tmp_path = "%s.%d.tmp" % (path, os.getpid())
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        try:
+            Repo.clone_from(url, tmp_path, **kwargs)
+            os.rename(tmp_path, path)
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self._write_metadata(url, self._dir_size(path))
+
+    def _update(self, repo : Repo):
+        # fetch and move the current branch to its upstream, there is no working tree to merge in to
+        try:
+            repo.remotes[0].fetch()
+            if repo.head.is_detached: return
+            tracking_branch = repo.active_branch.tracking_branch()
+            if tracking_branch: repo.active_branch.set_commit(tracking_branch.commit)
+        except (GitCommandError, IndexError, ValueError): pass
+
+    def _metadata_path(self, url : str) -> str:
+        return self.path(url) + ".json"
+
+    def _metadata(self, url : str) -> dict:
+        try:
+            with open(self._metadata_path(url), "r") as f: return json.load(f)
+        except (OSError, ValueError): return {}
+
+    def _write_metadata(self, url : str, size : int):
+        with open(self._metadata_path(url), "w") as f:
+            json.dump({"url": url, "size": size, "fetched_at": time.time()}, f)
+
+    def _touch(self, url : str):
+        # the metadata file modification time tracks when the clone was last used
+        try: os.utime(self._metadata_path(url))
+        except OSError: pass
+
+    @staticmethod
+    def _dir_size(path : str) -> int:
+        out = 0
+        for root, _, files in os.walk(path):
+            for filename in files:
+                try: out += os.lstat(os.path.join(root, filename)).st_size
+                except OSError: pass
+        return out
+
+    @contextmanager
+    def _file_lock(self, url : str, blocking : bool = True, shared : bool = False, suffix : str = ".lock") -> Iterator[bool]:
+        path = self.path(url) + suffix
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        while True:
+            with open(path, "a") as f:
+                if not fcntl:
+                    yield True
+                    return
+                try: fcntl.flock(f.fileno(), (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    # the lock file was deleted by an eviction while waiting for the lock, lock the new file instead
+                    if not self._same_file(f, path): continue
+                    yield True
+                    return
+                finally: fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _same_file(f, path : str) -> bool:
+        try: return os.fstat(f.fileno()).st_ino == os.stat(path).st_ino
+        except OSError: return False
+
+    def _handles(self) -> dict[str,Repo]:
+        if not hasattr(self._local, "repos"): self._local.repos = {}
+        return self._local.repos
+
+    def _lock(self, url : str) -> threading.Lock:
+        with self._locks_lock:
+            if url not in self._locks: self._locks[url] = threading.Lock()
+            return self._locks[url]
+
+def fetch_missing_blobs(repo : Repo, commit_sha : str, shas : Optional[Iterable[str]] = None):
+    """
+    Fetch the blobs of a commit that are missing from a partial clone in batches. Git fetches missing
+    blobs on demand but one request per blob is slow when many blobs are read, such as when searching.
+
+    :param repo: The repository.
+    :param commit_sha: The commit whose tree contains the blobs.
+    :param shas: Only fetch these blobs if provided.
+    """
+    remote = next(filter(lambda r: r.config_reader.get_value("promisor", False), repo.remotes), None)
+    if not remote: return
+    missing = []
+    for line in repo.git.rev_list("--objects", "--missing=print", "--no-walk", commit_sha).splitlines():
+        if line.startswith("?"): missing.append(line[1:])
+    if shas is not None: missing = list(set(missing).intersection(shas))
+    for i in range(0, len(missing), FETCH_BATCH_SIZE):
+        # same arguments git uses when it fetches a missing object on demand
+        repo.git(c="fetch.negotiationAlgorithm=noop").fetch(remote.name, "--no-tags", "--no-write-fetch-head", "--recurse-submodules=no",
+            "--filter=blob:none", *missing[i:i + FETCH_BATCH_SIZE])
+
+REPOSITORY_MANAGER = RepositoryManager()
@@ -1,11 +1,10 @@
-from fnmatch import fnmatch
-
-from git import BadName, Tree, Blob
+from git import BadName
 
 from ....error.bot import ToolPropertyInvalidError
 from ...property import PropertyDefinition
 from ..response import ToolMessageResponse
 from .base import BaseGitTool
+from .path_index import PathIndex
 
 class GitSearchFileTool(BaseGitTool):
 
@@ -14,11 +13,11 @@ class GitSearchFileTool(BaseGitTool):
         return "git-search-file"
 
     @staticmethod
-    def description():
+    def description(**kwargs):
         return "Search the the repository for files matching the given name, wildcards are supported."
 
     @staticmethod
-    def properties():
+    def properties(**kwargs):
         return BaseGitTool.properties() + [
             PropertyDefinition("name", description="The name to search for.", required=True),
             PropertyDefinition("commit", 
@@ -30,15 +29,8 @@ class GitSearchFileTool(BaseGitTool):
         out = ""
         try:
             commit_obj = self.repo.commit(commit)
-            out = "\n".join(list(set(self._search_tree(name, commit_obj.tree))))
+            out = "\n".join(sorted(PathIndex.for_commit(commit_obj).search(name)))
         except BadName as e:
             self._log_error("Error occured when trying search tree.", e, {"search_filename": name, "git_repository": repository, "git_commit": commit})
             raise ToolPropertyInvalidError(self.name(), "commit")
         return ToolMessageResponse(out if out else "(no files found)")
-
-    def _search_tree(self, name : str, tree : Tree) -> list[str]:
-        out = []
-        for item in tree.traverse():
-            if isinstance(item, Blob) and fnmatch(item.name, name):
-                out.append(item.path)
-        return out
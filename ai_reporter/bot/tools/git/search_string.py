@@ -1,11 +1,18 @@
-from git import BadName, Blob, Tree
+from itertools import islice
+from typing import Optional
+
+from git import BadName, Commit, GitCommandError
 
 from ....error.bot import ToolPropertyInvalidError
-from ...property import PropertyDefinition
+from ...property import PropertyDefinition, PropertyType
 from ..response import ToolMessageResponse
 from .base import BaseGitTool
+from .grep import grep
+from .repository import fetch_missing_blobs
+from .trigram_index import DOC_BINARY, TrigramIndex
 
-MAX_FILE_SIZE = 131072 # 128KB
+MAX_RESULTS = 100
+MAX_PATHSPECS = 1000
 
 class GitSearchStringTool(BaseGitTool):
 
@@ -14,33 +21,44 @@ class GitSearchStringTool(BaseGitTool):
         return "git-search-string"
 
     @staticmethod
-    def description():
-        return "Search the the repository for files containing a string."
+    def description(**kwargs):
+        return "Search the contents of the files in the repository for a string or regular expression. " + \
+            "Returns up to %d matching lines formatted as path:line:text." % MAX_RESULTS
 
     @staticmethod
-    def properties():
+    def properties(**kwargs):
         return BaseGitTool.properties() + [
             PropertyDefinition("string", description="The string to search for.", required=True),
-            PropertyDefinition("commit", 
+            PropertyDefinition("regex", type=PropertyType.BOOL,
+                description="Treat the string as an extended regular expression, search for the literal string if not provided."),
+            PropertyDefinition("ignore_case", type=PropertyType.BOOL, description="Perform a case insensitive search."),
+            PropertyDefinition("commit",
                 description="The commit to base the search in, use the most recent commit (HEAD) if not provided."),
         ]
 
-    def execute(self, repository : str, string : str, commit : str = "HEAD", *args, **kwargs):
+    def execute(self, repository : str, string : str, regex : bool = False, ignore_case : bool = False, commit : str = "HEAD", *args, **kwargs):
         super().execute(repository=repository, **kwargs)
-        out = ""
         try:
             commit_obj = self.repo.commit(commit)
-            out = "\n".join(list(set(self._search_tree(string, commit_obj.tree))))
+            # the trigram index only folds the case of ASCII letters
+            use_index = not regex and (not ignore_case or string.isascii())
+            paths = self._candidate_paths(string, commit_obj) if use_index else None
+            if paths is not None and not paths: return ToolMessageResponse("(no matches found)")
+            if paths is None: fetch_missing_blobs(self.repo, commit_obj.hexsha)
+            matches = list(islice(grep(self.repo, commit_obj.hexsha, string, regex, ignore_case, paths), MAX_RESULTS + 1))
         except BadName as e:
             self._log_error("Error occured when trying search tree.", e, {"search_string": string, "git_repository": repository, "git_commit": commit})
             raise ToolPropertyInvalidError(self.name(), "commit")
-        return ToolMessageResponse(out if out else "(no files found)")
-
-    def _search_tree(self, string : str, tree : Tree) -> list[str]:
-        out = []
-        for item in tree.traverse():
-            if isinstance(item, Blob):
-                if item.size > MAX_FILE_SIZE: continue
-                data = bytes(item.data_stream.read()).decode("utf-8")
-                if string in data: out.append(item.path)
-        return out
\ No newline at end of file
+        except GitCommandError as e:
+            self._log_error("Error occured when trying search tree.", e, {"search_string": string, "git_repository": repository, "git_commit": commit})
+            raise ToolPropertyInvalidError(self.name(), "string", "invalid search pattern")
+        if not matches: return ToolMessageResponse("(no matches found)")
+        out = "\n".join(map(str, matches[:MAX_RESULTS]))
+        if len(matches) > MAX_RESULTS: out += "\n(results limited to the first %d matches)" % MAX_RESULTS
+        return ToolMessageResponse(out)
+
+    def _candidate_paths(self, string : str, commit : Commit) -> Optional[list[str]]:
+        # use the trigram index to narrow down the files git has to scan
+        candidates = TrigramIndex.for_commit(commit).candidates(string)
+        if len(candidates) > MAX_PATHSPECS: return None
+        return [path for path, _, doc_type in candidates if doc_type != DOC_BINARY]
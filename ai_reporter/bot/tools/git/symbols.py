@@ -0,0 +1,280 @@
+from abc import ABC, abstractmethod
+import ast
+from bisect import bisect_right
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+import os
+import re
+import sqlite3
+from typing import Iterable, Iterator, Optional
+
+from git import Commit, Repo
+
+from .cache import cache_path
+from .path_index import PathIndex
+from .repository import fetch_missing_blobs
+
+MAX_FILE_SIZE = 524288 # 512KB
+QUERY_BATCH_SIZE = 500
+SYMBOLS_VERSION = 3 # bump when extractors change, cached symbols of older versions are discarded
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parsed (blob TEXT, language TEXT, PRIMARY KEY (blob, language));
+CREATE TABLE IF NOT EXISTS symbols (
+    blob TEXT, language TEXT, name TEXT, kind TEXT, line INTEGER, container TEXT,
+    UNIQUE (blob, language, name, kind, line)
+);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name);
+CREATE TABLE IF NOT EXISTS commits (sha TEXT PRIMARY KEY);
+"""
+
+class Symbol:
+
+    """ A symbol (class, function, etc) defined in a file. """
+
+    def __init__(self, name : str, kind : str, line : int, container : str = ""):
+        """
+        :param name: The symbol name.
+        :param kind: The kind of symbol (class, function, method, etc).
+        :param line: The line the symbol is defined on.
+        :param container: The dotted name of the symbol the symbol is defined in, if any.
+        """
+        self.name = name
+        self.kind = kind
+        self.line = line
+        self.container = container
+
+    @property
+    def qualified_name(self) -> str:
+        return "%s.%s" % (self.container, self.name) if self.container else self.name
+
+class SymbolExtractor(ABC):
+
+    """ Base class for extracting the symbols defined in a source file. """
+
+    def __init__(self, language : str):
+        """
+        :param language: Name of the language, used to key the symbol cache.
+        """
+        self.language = language
+
+    @abstractmethod
+    def extract(self, contents : str) -> list[Symbol]:
+        """
+        Extract symbols from the contents of a file.
+
+        :param contents: The file contents.
+        """
+        ...
+
+class PythonSymbolExtractor(SymbolExtractor):
+
+    """ Extracts the classes, functions and methods of Python files with the `ast` module. """
+
+    def __init__(self):
+        super().__init__("python")
+
+    def extract(self, contents : str) -> list[Symbol]:
+        try: tree = ast.parse(contents)
+        except (SyntaxError, ValueError): return []
+        out = []
+        def visit(node : ast.AST, container : str, in_class : bool):
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, ast.ClassDef):
+                    out.append(Symbol(child.name, "class", child.lineno, container))
+                    visit(child, (container + "." if container else "") + child.name, True)
+                elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    out.append(Symbol(child.name, "method" if in_class else "function", child.lineno, container))
+                    visit(child, (container + "." if container else "") + child.name, False)
+        visit(tree, "", False)
+        return out
+
+class RegexSymbolExtractor(SymbolExtractor):
+
+    """ Extracts symbols with regular expressions, each pattern must have a named group called 'name'. """
+
+    def __init__(self, language : str, patterns : Iterable[tuple[str,str]]):
+        """
+        :param language: Name of the language.
+        :param patterns: List of symbol kind and regular expression pairs, patterns are matched per line.
+        """
+        super().__init__(language)
+        self.patterns = list(map(lambda p: (p[0], re.compile(p[1], re.MULTILINE)), patterns))
+
+    def extract(self, contents : str) -> list[Symbol]:
+        line_starts = [0] + [m.end() for m in re.finditer("\n", contents)]
+        out = []
+        for kind, pattern in self.patterns:
+            for match in pattern.finditer(contents):
+                out.append(Symbol(match.group("name"), kind, bisect_right(line_starts, match.start("name"))))
+        out.sort(key=lambda s: s.line)
+        return out
+
+JS_PATTERNS = [
+    ("class", r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+(?P<name>[A-Za-z_$][\w$]*)"),
+    ("interface", r"^\s*(?:export\s+)?interface\s+(?P<name>[A-Za-z_$][\w$]*)"),
+    ("type", r"^\s*(?:export\s+)?type\s+(?P<name>[A-Za-z_$][\w$]*)\s*(?:<[^=]*>)?\s*="),
+    ("function", r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*(?P<name>[A-Za-z_$][\w$]*)"),
+    ("function", r"^\s*(?:export\s+)?(?:const|let|var)\s+(?P<name>[A-Za-z_$][\w$]*)\s*=\s*(?:async\s*)?(?:\([^)]*\)|[A-Za-z_$][\w$]*)\s*=>"),
+]
+
+PHP_PATTERNS = [
+    ("class", r"^\s*(?:(?:abstract|final|readonly)\s+)*(?:class|interface|trait|enum)\s+(?P<name>\w+)"),
+    ("function", r"^\s*(?:(?:public|protected|private|static|abstract|final)\s+)*function\s+&?\s*(?P<name>\w+)"),
+]
+
+GO_PATTERNS = [
+    ("type", r"^type\s+(?P<name>\w+)\s+(?:struct|interface)"),
+    ("function", r"^func\s+(?:\([^)]*\)\s*)?(?P<name>\w+)"),
+]
+
+# patterns are matched with re.MULTILINE, keep them on a single line with [ \t] instead of \s
+JAVA_PATTERNS = [
+    ("class", r"^[ \t]*(?:(?:public|protected|private|internal|static|abstract|final|sealed|partial|readonly)[ \t]+)*(?:class|interface|enum|record|struct)[ \t]+(?P<name>\w+)"),
+    # a declaration with a body on the same line or parameters continued on the next line, not a call or an abstract method
+    ("method", r"^[ \t]*(?:(?:public|protected|private|internal|static|final|abstract|synchronized|override|virtual|async)[ \t]+)+[\w<>\[\],.? \t]*?[ \t](?P<name>\w+)[ \t]*\([^;\n]*(?:\{|$)"),
+]
+
+KOTLIN_PATTERNS = [
+    ("class", r"^[ \t]*(?:(?:public|protected|private|internal|abstract|final|open|sealed|data|enum|annotation|inner|value|expect|actual)[ \t]+)*(?:class|interface|object)[ \t]+(?P<name>\w+)"),
+    ("function", r"^[ \t]*(?:(?:public|protected|private|internal|abstract|final|open|override|suspend|inline|operator|infix|tailrec|external|expect|actual)[ \t]+)*fun[ \t]+(?:<[^>\n]*>[ \t]*)?(?:[\w.<>?]+\.)?(?P<name>\w+)[ \t]*\("),
+]
+
+SCALA_PATTERNS = [
+    ("class", r"^[ \t]*(?:(?:private|protected|abstract|final|sealed|implicit|case|open)(?:\[[^\]\n]*\])?[ \t]+)*(?:class|trait|object|enum)[ \t]+(?P<name>\w+)"),
+    ("method", r"^[ \t]*(?:(?:private|protected|final|override|implicit|inline|abstract)(?:\[[^\]\n]*\])?[ \t]+)*def[ \t]+(?P<name>\w+)"),
+]
+
+RUBY_PATTERNS = [
+    ("class", r"^\s*(?:class|module)\s+(?P<name>[\w:]+)"),
+    ("method", r"^\s*def\s+(?:self\.)?(?P<name>[\w?!=]+)"),
+]
+
+RUST_PATTERNS = [
+    ("type", r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait|union)\s+(?P<name>\w+)"),
+    ("function", r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:const\s+)?(?:async\s+)?(?:unsafe\s+)?(?:extern\s+\"[^\"]*\"\s+)?fn\s+(?P<name>\w+)"),
+]
+
+SYMBOL_EXTRACTORS : dict[str,SymbolExtractor] = {
+    ".py": PythonSymbolExtractor(),
+    **dict.fromkeys([".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx"], RegexSymbolExtractor("javascript", JS_PATTERNS)),
+    ".php": RegexSymbolExtractor("php", PHP_PATTERNS),
+    ".go": RegexSymbolExtractor("go", GO_PATTERNS),
+    **dict.fromkeys([".java", ".cs"], RegexSymbolExtractor("java", JAVA_PATTERNS)),
+    **dict.fromkeys([".kt", ".kts"], RegexSymbolExtractor("kotlin", KOTLIN_PATTERNS)),
+    ".scala": RegexSymbolExtractor("scala", SCALA_PATTERNS),
+    ".rb": RegexSymbolExtractor("ruby", RUBY_PATTERNS),
+    ".rs": RegexSymbolExtractor("rust", RUST_PATTERNS),
+}
+""" Symbol extractors by file extension, add to this to support more languages. """
+
+def get_symbol_extractor(path : str) -> Optional[SymbolExtractor]:
+    """
+    Get the symbol extractor for a file.
+
+    :param path: The file path.
+    """
+    return SYMBOL_EXTRACTORS.get(os.path.splitext(path)[1].lower())
+
+class SymbolIndex:
+
+    """
+    SQLite index of the symbols defined in the files of a repository. Symbols are cached by blob SHA
+    so files that didn't change between commits are never parsed again.
+    """
+
+    def __init__(self, repo : Repo):
+        """
+        :param repo: The repository.
+        """
+        self.repo = repo
+        self.path = cache_path(repo, "symbols.sqlite")
+
+    def find(self, commit : Commit, pattern : str, limit : int = 50) -> list[tuple[str,Symbol]]:
+        """
+        Find symbols in a commit whose name matches a wildcard pattern. Returns a list of file path and symbol pairs.
+
+        :param commit: The commit to search.
+        :param pattern: The symbol name, wildcards are supported.
+        :param limit: The maximum number of symbols to return.
+        """
+        files = self._supported_files(commit)
+        with self._connect() as conn:
+            if not conn.execute("SELECT 1 FROM commits WHERE sha = ?", (commit.hexsha,)).fetchone():
+                self._parse_missing(conn, commit, files)
+                conn.execute("INSERT OR IGNORE INTO commits VALUES (?)", (commit.hexsha,))
+            blob_paths : dict[tuple[str,str],list[str]] = {}
+            for path, (sha, extractor) in files.items():
+                blob_paths.setdefault((sha, extractor.language), []).append(path)
+            # match the literal prefix of the pattern in SQL, then the full pattern in Python
+            prefix = re.split(r"[*?\[]", pattern, 1)[0]
+            rows = conn.execute("SELECT blob, language, name, kind, line, container FROM symbols WHERE name >= ? AND name < ? ORDER BY name",
+                (prefix, prefix + "\U0010ffff") if prefix != pattern else (pattern, pattern + "\0"))
+            out = []
+            for blob, language, name, kind, line, container in rows:
+                if not fnmatchcase(name, pattern): continue
+                for path in blob_paths.get((blob, language), []):
+                    out.append((path, Symbol(name, kind, line, container)))
+                if len(out) >= limit: break
+            return out[:limit]
+
+    def outline(self, commit : Commit, path : str) -> Optional[list[Symbol]]:
+        """
+        Get the symbols defined in a file, or None if the file doesn't exist or its language isn't supported.
+
+        :param commit: The commit containing the file.
+        :param path: The file path.
+        """
+        path = path.strip("/")
+        sha = PathIndex.for_commit(commit).blob_sha(path)
+        extractor = get_symbol_extractor(path)
+        if not sha or not extractor: return None
+        with self._connect() as conn:
+            self._parse_missing(conn, commit, {path: (sha, extractor)})
+            rows = conn.execute("SELECT name, kind, line, container FROM symbols WHERE blob = ? AND language = ? ORDER BY line",
+                (sha, extractor.language))
+            return list(map(lambda r: Symbol(*r), rows))
+
+    def _supported_files(self, commit : Commit) -> dict[str,tuple[str,SymbolExtractor]]:
+        out = {}
+        for path, sha in PathIndex.for_commit(commit).files.items():
+            extractor = get_symbol_extractor(path)
+            if extractor: out[path] = (sha, extractor)
+        return out
+
+    def _parse_missing(self, conn : sqlite3.Connection, commit : Commit, files : dict[str,tuple[str,SymbolExtractor]]):
+        blobs = dict(map(lambda f: ((f[0], f[1].language), f[1]), files.values()))
+        keys = list(blobs.keys())
+        for i in range(0, len(keys), QUERY_BATCH_SIZE):
+            batch = keys[i:i + QUERY_BATCH_SIZE]
+            rows = conn.execute("SELECT blob, language FROM parsed WHERE blob IN (%s)" % ",".join("?" * len(batch)), list(map(lambda k: k[0], batch)))
+            for row in rows: blobs.pop(row, None)
+        if not blobs: return
+        if len(blobs) > 1: fetch_missing_blobs(self.repo, commit.hexsha, map(lambda k: k[0], blobs.keys()))
+        parsed = []
+        for (sha, language), extractor in blobs.items():
+            binsha = bytes.fromhex(sha)
+            symbols = []
+            if self.repo.odb.info(binsha).size <= MAX_FILE_SIZE:
+                symbols = extractor.extract(self.repo.odb.stream(binsha).read().decode("utf-8", "replace"))
+            parsed.append((sha, language, symbols))
+        # lock the database so concurrent builds don't insert the symbols of a blob twice
+        conn.execute("BEGIN IMMEDIATE")
+        for sha, language, symbols in parsed:
+            # another thread or process may have parsed the blob meanwhile
+            if conn.execute("SELECT 1 FROM parsed WHERE blob = ? AND language = ?", (sha, language)).fetchone(): continue
+            conn.executemany("INSERT OR IGNORE INTO symbols VALUES (?, ?, ?, ?, ?, ?)",
+                map(lambda s: (sha, language, s.name, s.kind, s.line, s.container), symbols))
+            conn.execute("INSERT INTO parsed VALUES (?, ?)", (sha, language))
+        conn.commit()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SYMBOLS_VERSION:
+                conn.executescript("DROP TABLE IF EXISTS parsed; DROP TABLE IF EXISTS symbols; DROP TABLE IF EXISTS commits;" +
+                    "PRAGMA user_version = %d;" % SYMBOLS_VERSION)
+            conn.executescript(SCHEMA)
+            with conn: yield conn
+        finally: conn.close()
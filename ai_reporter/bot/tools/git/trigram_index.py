@@ -0,0 +1,218 @@
+from array import array
+from bisect import bisect_left
+import json
+import mmap
+import os
+import struct
+from typing import Iterable, Optional, Self
+
+from git import Commit, Repo
+
+from .cache import IndexCache, cache_path, is_binary, temp_path
+from .path_index import PathIndex
+from .repository import fetch_missing_blobs
+
+MAGIC = b"AIRTRI01"
+HEADER = struct.Struct("<8sIIQ") # magic, trigram count, posting count, offset of document table
+MAX_FILE_SIZE = 131072 # 128KB
+MEMORY_CACHE_SIZE = 4
+MAX_DISK_INDEXES = 4 # most recently built index files kept per repository, older ones are deleted
+
+DOC_INDEXED = 0
+DOC_OVERSIZED = 1
+DOC_BINARY = 2
+
+class TrigramIndex:
+
+    """
+    On-disk trigram inverted index of the file contents of a single commit. Queries memory-map the
+    index file and intersect posting lists so only candidate blobs need to be opened. Indexes are built
+    incrementally from the index of the nearest indexed commit, so only changed blobs are read.
+
+    File layout: header, sorted trigram keys, posting offsets, posting counts, postings (document ids),
+    JSON document table. All integers are unsigned 32 bit.
+    """
+
+    _memory_cache = IndexCache(MEMORY_CACHE_SIZE)
+
+    def __init__(self, path : str):
+        """
+        :param path: Path to the index file.
+        """
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, key_count, posting_count, docs_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC: raise ValueError("invalid trigram index '%s'" % path)
+        view = memoryview(self._mmap)
+        pos = HEADER.size
+        self._keys = view[pos:pos + key_count * 4].cast("I")
+        pos += key_count * 4
+        self._offsets = view[pos:pos + key_count * 4].cast("I")
+        pos += key_count * 4
+        self._counts = view[pos:pos + key_count * 4].cast("I")
+        pos += key_count * 4
+        self._postings = view[pos:pos + posting_count * 4].cast("I")
+        data = json.loads(bytes(self._mmap[docs_offset:]).decode("utf-8"))
+        self.commit_sha : str = data["commit"]
+        self.docs : list[tuple[str,str,int]] = [tuple(d) for d in data["docs"]]
+
+    @classmethod
+    def for_commit(cls, commit : Commit) -> Self:
+        """
+        Get the trigram index for the given commit, load it from the cache or build it if needed.
+
+        :param commit: The commit to index.
+        """
+        # concurrent callers (warm up and tool calls) wait for a single build
+        return cls._memory_cache.get((commit.repo.git_dir, commit.hexsha), lambda: cls._load_or_build(commit))
+
+    @classmethod
+    def _load_or_build(cls, commit : Commit) -> Self:
+        path = cls._index_path(commit.repo, commit.hexsha)
+        try: return cls(path)
+        except (OSError, ValueError): pass
+        cls.build(commit)
+        return cls(path)
+
+    @classmethod
+    def build(cls, commit : Commit):
+        """
+        Build the trigram index for the given commit and write it to the repository cache. The index of the nearest
+        indexed commit (a parent, or else the most recently built index) is updated with the tree diff if there is one.
+        Only the most recently built index files are kept.
+
+        :param commit: The commit to index.
+        """
+        repo = commit.repo
+        base = cls._load_base(commit)
+        if base:
+            base_sha, docs, postings = base
+            changes = cls._tree_diff(repo, base_sha, commit.hexsha)
+            changed_paths = set(changes.keys())
+            keep = [i for i in range(len(docs)) if docs[i][0] not in changed_paths]
+            remap = dict((old_id, new_id) for new_id, old_id in enumerate(keep))
+            docs = [docs[i] for i in keep]
+            for trigram, ids in postings.items():
+                postings[trigram] = array("I", (remap[i] for i in ids if i in remap))
+            new_files = [(path, sha) for path, sha in changes.items() if sha]
+        else:
+            docs, postings = [], {}
+            new_files = list(PathIndex.for_commit(commit).files.items())
+        fetch_missing_blobs(repo, commit.hexsha, map(lambda f: f[1], new_files))
+        for path, sha in new_files:
+            doc_id = len(docs)
+            data = cls._read_blob(repo, sha)
+            if data is None:
+                docs.append((path, sha, DOC_OVERSIZED))
+                continue
+            if is_binary(data):
+                docs.append((path, sha, DOC_BINARY))
+                continue
+            docs.append((path, sha, DOC_INDEXED))
+            for trigram in cls._trigrams(data):
+                postings.setdefault(trigram, array("I")).append(doc_id)
+        cls._write(cls._index_path(repo, commit.hexsha), commit.hexsha, docs, postings)
+        cls._delete_old_indexes(repo)
+
+    def candidates(self, string : str) -> list[tuple[str,str,int]]:
+        """
+        Get the documents (path, blob SHA, document type) that may contain the given string. Oversized documents are
+        always candidates and binary documents never are.
+
+        :param string: The string to search for.
+        """
+        trigrams = self._trigrams(string.encode("utf-8"))
+        if not trigrams:
+            return [doc for doc in self.docs if doc[2] != DOC_BINARY]
+        lists = []
+        for trigram in trigrams:
+            i = bisect_left(self._keys, trigram)
+            if i >= len(self._keys) or self._keys[i] != trigram:
+                lists = []
+                break
+            lists.append(self._postings[self._offsets[i]:self._offsets[i] + self._counts[i]])
+        ids = set()
+        if lists:
+            lists.sort(key=len)
+            ids = set(lists[0])
+            for ids_list in lists[1:]:
+                ids.intersection_update(ids_list)
+                if not ids: break
+        return [self.docs[i] for i in sorted(ids)] + [doc for doc in self.docs if doc[2] == DOC_OVERSIZED]
+
+    @staticmethod
+    def _trigrams(data : bytes) -> set[int]:
+        # trigrams are case folded so the index can serve case insensitive searches
+        data = data.lower()
+        return set(int.from_bytes(data[i:i+3], "big") for i in range(len(data) - 2))
+
+    @staticmethod
+    def _read_blob(repo : Repo, sha : str) -> Optional[bytes]:
+        binsha = bytes.fromhex(sha)
+        if repo.odb.info(binsha).size > MAX_FILE_SIZE: return None
+        return repo.odb.stream(binsha).read()
+
+    @staticmethod
+    def _tree_diff(repo : Repo, from_sha : str, to_sha : str) -> dict[str,Optional[str]]:
+        """ Map of changed file paths to their new blob SHA, or None if the file was removed or is not a blob. """
+        out : dict[str,Optional[str]] = {}
+        tokens = repo.git.diff_tree("-r", "--no-renames", "-z", from_sha, to_sha).split("\0")
+        for meta, path in zip(tokens[0::2], tokens[1::2]):
+            _, new_mode, _, new_sha, status = meta.split(" ")
+            is_blob = status != "D" and new_mode.startswith(("100", "120"))
+            out[path] = new_sha if is_blob else None
+        return out
+
+    @staticmethod
+    def _index_path(repo : Repo, commit_sha : str) -> str:
+        return cache_path(repo, "trigram_index", "%s.idx" % commit_sha)
+
+    @staticmethod
+    def _index_files(repo : Repo) -> list[str]:
+        """ Paths of the index files of a repository, most recently built first. """
+        index_dir = os.path.dirname(cache_path(repo, "trigram_index", "_"))
+        out = []
+        for filename in os.listdir(index_dir):
+            if not filename.endswith(".idx"): continue
+            path = os.path.join(index_dir, filename)
+            try: out.append((os.path.getmtime(path), path))
+            except OSError: continue
+        return list(map(lambda f: f[1], sorted(out, reverse=True)))
+
+    @classmethod
+    def _load_base(cls, commit : Commit) -> Optional[tuple[str, list[tuple[str,str,int]], dict[int,array]]]:
+        """ The commit SHA, documents and postings of the index to update for a commit, None if there is none. """
+        paths = list(map(lambda p: cls._index_path(commit.repo, p.hexsha), commit.parents)) + cls._index_files(commit.repo)
+        for path in paths:
+            # another process may delete the index meanwhile
+            try: index = TrigramIndex(path)
+            except (OSError, ValueError): continue
+            postings = {}
+            for i in range(len(index._keys)):
+                postings[index._keys[i]] = array("I", index._postings[index._offsets[i]:index._offsets[i] + index._counts[i]])
+            return index.commit_sha, list(index.docs), postings
+        return None
+
+    @classmethod
+    def _delete_old_indexes(cls, repo : Repo):
+        # indexes that are open stay readable after their file is deleted
+        for path in cls._index_files(repo)[MAX_DISK_INDEXES:]:
+            try: os.remove(path)
+            except OSError: pass
+
+    @staticmethod
+    def _write(path : str, commit_sha : str, docs : Iterable[tuple[str,str,int]], postings : dict[int,array]):
+        keys = array("I", sorted(k for k, ids in postings.items() if ids))
+        offsets, counts, all_ids = array("I"), array("I"), array("I")
+        for key in keys:
+            offsets.append(len(all_ids))
+            counts.append(len(postings[key]))
+            all_ids.extend(postings[key])
+        docs_data = json.dumps({"commit": commit_sha, "docs": list(docs)}).encode("utf-8")
+        docs_offset = HEADER.size + (len(keys) * 3 + len(all_ids)) * 4
+        tmp_path = temp_path(path)
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(keys), len(all_ids), docs_offset))
+            for section in (keys, offsets, counts, all_ids): f.write(section.tobytes())
+            f.write(docs_data)
+        os.replace(tmp_path, path)
@@ -1,5 +1,6 @@
 import logging
-from typing import Optional
+import time
+from typing import Iterable, Optional
 
 from ...error.bot import (
     MalformedBotResponseError,
@@ -7,9 +8,11 @@ from ...error.bot import (
     ToolPropertyInvalidError,
     ToolPropertyMissingError,
 )
+from ..property import PropertyDefinition
 from .base import BaseTool
 from .done import DoneTool
 from .git import TOOLS as GIT_TOOLS
+from .git.repository import REPOSITORY_MANAGER, RepositoryManager
 from .response import ToolResponseBase
 from .web import TOOLS as WEB_TOOLS
 
@@ -28,11 +31,17 @@ class ToolHandler:
     def __init__(
         self,
         tools : dict[str,dict],
-        logger : Optional[logging.Logger] = None
+        logger : Optional[logging.Logger] = None,
+        repository_manager : RepositoryManager = REPOSITORY_MANAGER
     ):
+        """
+        :param tools: The tools the bot is allowed to use and their configuration.
+        :param logger: Optional logger.
+        :param repository_manager: Manager of the Git repositories used by the git tools, shared by all handlers by default.
+        """
         self.tools_config = tools
         self.logger = logger
-        self.state : dict[str,object] = {}
+        self.state : dict[str,object] = {"repository_manager": repository_manager}
 
     @property
     def tools(self) -> list[type[BaseTool]]:
@@ -43,6 +52,16 @@ class ToolHandler:
                 if name == collection_name: out += classes
         return out + [DoneTool]
 
+    def get_tool(self, name : str) -> Optional[type[BaseTool]]:
+        """
+        The available tool with the given name.
+
+        :param name: The tool name.
+        """
+        for tool_class in self.tools:
+            if tool_class.name() == name: return tool_class
+        return None
+
     def get_tool_config(self, tool : type[BaseTool]) -> dict:
         """
         The configuration for the given tool.
@@ -55,6 +74,20 @@ class ToolHandler:
                     return self.tools_config.get(collection_name, {})
         return {}
 
+    def warm_up(self):
+        """
+        Prepare the resources of the available tools, such as cloning repositories, ahead of the first tool call.
+        Errors are logged and otherwise ignored, the tools retry when they are called.
+        """
+        warmed_up = set()
+        for tool_class in self.tools:
+            # tools of the same collection share their warm up
+            func = getattr(tool_class.warm_up, "__func__", tool_class.warm_up)
+            if func in warmed_up: continue
+            warmed_up.add(func)
+            try: tool_class.warm_up(self.state, self.logger, **self.get_tool_config(tool_class))
+            except Exception as e: self._log_error(tool_class.name(), e)
+
     def call(self, name : str, args : dict) -> ToolResponseBase:
         """
         Execute the given tool with the given arguments.
@@ -69,22 +102,16 @@ class ToolHandler:
                 if not this_tool_name: continue
                 if this_tool_name == name:
                     tool_config = self.get_tool_config(tool_class)
-                    tool_props = tool_class.properties(**tool_config)
-                    # check for required properties
-                    for prop in tool_props:
-                        if not prop.check_type(args.get(prop.name)):
-                            raise ToolPropertyInvalidError(this_tool_name, prop.name, "Unexpected value type.")
-                        if not prop.check_required(args.get(prop.name)):
-                            raise ToolPropertyMissingError(this_tool_name, prop.name)
-                        if not prop.check_choices(args.get(prop.name)):
-                            raise ToolPropertyInvalidError(this_tool_name, prop.name, "Value is not one of the provided options.")
-                        if not prop.check_range(args.get(prop.name)):
-                            raise ToolPropertyInvalidError(this_tool_name, prop.name, "Value is out of range.")
+                    self.check_args(this_tool_name, tool_class.properties(**tool_config), args)
                     # call tool
                     tool_obj = tool_class(state=self.state, logger=self.logger, **tool_config)
-                    resp = tool_obj.execute(**args)
-                    self._log("Response from %s." % tool_obj, {"action": "response", "object": "tool '%s'" % name, 
-                        "tool_response": resp.to_dict(), "tool_name": name, "tool_args": args})
+                    start = time.monotonic()
+                    try: resp = tool_obj.execute(**dict(filter(lambda a: a[1] is not None, args.items())))
+                    finally: tool_obj.close()
+                    resp.duration = time.monotonic() - start
+                    self._log("Response from %s in %.2f seconds." % (tool_obj, resp.duration), {"action": "response",
+                        "object": "tool '%s'" % name, "tool_response": resp.to_dict(), "tool_name": name, "tool_args": args,
+                        "tool_duration": resp.duration})
                     return resp
         except TypeError as e:
             self._log_error(name, e)
@@ -94,6 +121,27 @@ class ToolHandler:
             raise e
         raise ToolNotDefinedError(name)
 
+    @staticmethod
+    def check_args(name : str, properties : Iterable[PropertyDefinition], args : dict):
+        """
+        Check arguments against their property definitions, raises an error the bot can correct if one is missing or invalid.
+
+        :param name: Name of the tool the arguments are for.
+        :param properties: The property definitions.
+        :param args: The arguments.
+        """
+        for prop in properties:
+            if not prop.check_required(args.get(prop.name)):
+                raise ToolPropertyMissingError(name, prop.name)
+            # optional properties that were not provided use the tool's default
+            if args.get(prop.name) is None: continue
+            if not prop.check_type(args.get(prop.name)):
+                raise ToolPropertyInvalidError(name, prop.name, "Unexpected value type.")
+            if not prop.check_choices(args.get(prop.name)):
+                raise ToolPropertyInvalidError(name, prop.name, "Value is not one of the provided options.")
+            if not prop.check_range(args.get(prop.name)):
+                raise ToolPropertyInvalidError(name, prop.name, "Value is out of range.")
+
     def _log(self, message : str, params : dict = {}, level : int = logging.INFO):
         params["_module"] = "tool"
         if self.logger: self.logger.log(level, message, extra=params)
@@ -8,11 +8,13 @@ class ToolResponseBase:
     def __init__(self):
         self.tool_name : Optional[str] = None
         self.tool_call_id : Optional[str] = None
+        self.duration : float = 0.0
 
     def to_dict(self) -> dict:
         return {
             "name": self.tool_name,
             "tool_call_id": self.tool_call_id,
+            "duration": self.duration,
             "done": False
         }
 
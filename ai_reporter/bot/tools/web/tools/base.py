@@ -40,6 +40,10 @@ class BaseWebTool(BaseTool):
         self.browser = self._get_browser(selenium_browser, selenium_url, secrets)
         self.screenshot_log_path = screenshot_log_path
 
+    @staticmethod
+    def resource():
+        return "browser"
+
     def _get_browser(self, selenium_browser : str, selenium_url : Optional[str] = None, secrets : list[dict] = []) -> Browser:
         # get previously initialized browser
         if "browser" in self.state and isinstance(self.state["browser"], Browser): return self.state["browser"]
@@ -48,6 +48,14 @@ class BotMaxIterationsError(Exception):
     """ Bot reached the maximum amount of iterations without completing the report. """
     pass
 
+class BotTokenBudgetError(Exception):
+    """ The report can't be completed within its token budget. """
+    pass
+
+class CompletionCacheMissError(Exception):
+    """ Chat completion is not in the completion cache while in replay mode. """
+    pass
+
 class BotClientNotExistError(ValueError):
     """ Specified bot client does not exist. """
     pass
\ No newline at end of file
@@ -6,5 +6,6 @@ setup(
     version='0.0.1',
     description='Use AI to generate reports with various tools and the ability to chain reports together based on previous results.',
     author='Nathan Ogden',
-    install_requires=['pyyaml', 'requests', 'openai', 'GitPython', 'selenium', 'pillow']
+    install_requires=['pyyaml', 'requests', 'openai', 'GitPython', 'selenium', 'pillow'],
+    extras_require={'tiktoken': ['tiktoken']}
 )
\ No newline at end of file
@@ -0,0 +1,40 @@
+from git import Repo
+import pytest
+
+from ai_reporter.bot.tools.git.repository import RepositoryManager
+
+from .stub_server import StubServer
+
+@pytest.fixture
+def stub():
+    """ Factory of local chat completions API stub servers, closed after the test. """
+    servers = []
+    def create(plan : list[str] = [], **kwargs) -> StubServer:
+        servers.append(StubServer(plan, **kwargs))
+        return servers[-1]
+    yield create
+    for server in servers: server.close()
+
+@pytest.fixture
+def origin(tmp_path):
+    """ Factory of named Git repositories with one commit per dict of file contents, returns the file:// URL. """
+    def create(*commits : dict[str,str], name : str = "origin") -> str:
+        repo = Repo.init(tmp_path / name, initial_branch="main")
+        with repo.config_writer() as config:
+            config.set_value("user", "name", "test")
+            config.set_value("user", "email", "test@example.com")
+            # clones can only use filters when the origin serves them
+            config.set_value("uploadpack", "allowFilter", True)
+        for i, files in enumerate(commits):
+            for path, content in files.items():
+                (tmp_path / name / path).parent.mkdir(parents=True, exist_ok=True)
+                (tmp_path / name / path).write_text(content)
+            repo.git.add("-A")
+            repo.git.commit("-m", "commit %d" % (i + 1))
+        return (tmp_path / name).as_uri()
+    return create
+
+@pytest.fixture
+def repository_manager(tmp_path) -> RepositoryManager:
+    """ Repository manager cloning in to a temporary work directory. """
+    return RepositoryManager(str(tmp_path / "work"))
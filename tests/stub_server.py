@@ -0,0 +1,65 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+class StubServer:
+
+    """
+    Local OpenAI compatible chat completions API for tests. Each request takes the next action from the plan:
+    'ok', 'sleep:<seconds>' (then ok), or an HTTP error status code such as '429' or '500'.
+    Responses are a JSON report with a 'summary' value, or a 'done' tool call when tools are requested.
+    """
+
+    def __init__(self, plan : list[str] = [], retry_after_ms : int = 50):
+        self.plan = list(plan)
+        self.retry_after_ms = retry_after_ms
+        self.requests : list[dict] = []
+        self.times : list[float] = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:%d/v1" % self.server.server_address[1]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _next(self, body : dict) -> str:
+        with self._lock:
+            self.requests.append(body)
+            self.times.append(time.monotonic())
+            return self.plan.pop(0) if self.plan else "ok"
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args): pass
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["content-length"])))
+                action = stub._next(body)
+                if action.startswith("sleep:"):
+                    time.sleep(float(action[6:]))
+                    action = "ok"
+                if action != "ok":
+                    return self._send(int(action), {"error": {"message": "stub error %s" % action}},
+                        {"retry-after-ms": str(stub.retry_after_ms)})
+                message = {"role": "assistant", "content": json.dumps({"summary": "ok"})}
+                if body.get("tools"):
+                    message = {"role": "assistant", "content": None, "tool_calls": [{"id": "call", "type": "function",
+                        "function": {"name": "done", "arguments": json.dumps({"summary": "ok"})}}]}
+                self._send(200, {"id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop", "message": message}],
+                    "usage": {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110}})
+            def _send(self, status : int, data : dict, headers : dict = {}):
+                content = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(content)))
+                for k, v in headers.items(): self.send_header(k, v)
+                self.end_headers()
+                # the client may have given up on the request (hedging)
+                try: self.wfile.write(content)
+                except OSError: pass
+        return Handler
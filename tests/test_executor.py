@@ -0,0 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+
+from ai_reporter import PropertyDefinition
+from ai_reporter.bot.tools.executor import ToolExecutor
+from ai_reporter.bot.tools.handler import ToolHandler
+
+def tool_handler(logger : logging.Logger = None) -> ToolHandler:
+    return ToolHandler({"done": {"properties": [PropertyDefinition("summary", required=True)]}}, logger)
+
+def test_tool_call_duration_is_logged(caplog):
+    logger = logging.getLogger("test_executor")
+    with caplog.at_level(logging.INFO, logger="test_executor"):
+        response = tool_handler(logger).call("done", {"summary": "ok"})
+    record = next(filter(lambda r: getattr(r, "action", None) == "response", caplog.records))
+    assert record.tool_duration == response.duration
+    assert record.tool_response["duration"] == response.duration
+
+def test_executors_of_a_conversation_share_the_pool():
+    pool = ThreadPoolExecutor(max_workers=2)
+    threads = set()
+    handler = tool_handler()
+    call = handler.call
+    handler.call = lambda name, args: threads.add(threading.current_thread()) or call(name, args)
+    try:
+        for i in range(4):
+            executor = ToolExecutor(handler, 2, pool)
+            assert executor.run([("call-%d" % i, "done", {"summary": "ok"})])[0].values == {"summary": "ok"}
+        # closing the executors leaves the shared pool running
+        assert pool.submit(lambda: True).result()
+        assert len(threads) <= 2
+    finally: pool.shutdown()
@@ -0,0 +1,49 @@
+import os
+
+from git import Repo
+import pytest
+
+from ai_reporter.bot.tools.git.diff import GitDiffTool
+from ai_reporter.error.bot import ToolPropertyInvalidError
+
+def diff_tool(repository_manager) -> GitDiffTool:
+    return GitDiffTool(state={"repository_manager": repository_manager})
+
+def test_patches_of_each_file(origin, repository_manager):
+    url = origin({"a.txt": "a\n", "b c.txt": "b\n"}, {"a.txt": "a2\n", "b c.txt": "c\n", "d/e.txt": "e\n"})
+    message = diff_tool(repository_manager).execute(url, from_commit="HEAD~1", patch=True).message
+    assert "CHANGED FILES: 3" in message
+    assert "M +1 -1 b c.txt" in message
+    assert "A +1 -0 d/e.txt" in message
+    for line in ["diff --git a/a.txt b/a.txt", "+a2", "diff --git a/b c.txt b/b c.txt", "+c", "diff --git a/d/e.txt b/d/e.txt", "+e"]:
+        assert line in message.splitlines()
+    # each patch is separated from the next by an empty line
+    assert "\n\ndiff --git a/b c.txt" in message
+
+def test_since_and_from_commit_are_rejected(origin, repository_manager):
+    url = origin({"a.txt": "a\n"}, {"a.txt": "b\n"})
+    with pytest.raises(ToolPropertyInvalidError):
+        diff_tool(repository_manager).execute(url, from_commit="HEAD~1", since="2020-01-01")
+
+def commit(repo : Repo, files : dict[str,str], message : str, authored : str, committed : str):
+    for name, content in files.items():
+        with open(os.path.join(repo.working_dir, name), "w") as f: f.write(content)
+    repo.git.add("-A")
+    repo.git.commit("-m", message, env={"GIT_AUTHOR_DATE": authored, "GIT_COMMITTER_DATE": committed})
+
+def test_dates_use_commit_time_with_merged_branch(origin, repository_manager):
+    url = origin()
+    repo = Repo(url[len("file://"):])
+    commit(repo, {"a.txt": "1\n"}, "first", "2020-01-10T12:00:00Z", "2020-01-10T12:00:00Z")
+    repo.git.checkout("-b", "side")
+    # authored before the other commits, committed (rebased) after them
+    commit(repo, {"b.txt": "side\n"}, "side", "2019-12-01T12:00:00Z", "2020-03-01T12:00:00Z")
+    repo.git.checkout("main")
+    commit(repo, {"a.txt": "2\n"}, "second", "2020-02-01T12:00:00Z", "2020-02-01T12:00:00Z")
+    repo.git.merge("--no-ff", "-m", "merge", "side", env={"GIT_AUTHOR_DATE": "2020-03-02T12:00:00Z", "GIT_COMMITTER_DATE": "2020-03-02T12:00:00Z"})
+    message = diff_tool(repository_manager).execute(url, since="2020-01-15", until="2020-02-15").message
+    shas = dict(map(lambda c: (c.message.strip(), c.hexsha), repo.iter_commits()))
+    assert "FROM: %s" % shas["first"] in message
+    assert "TO: %s" % shas["second"] in message
+    assert "M +1 -1 a.txt" in message
+    assert "b.txt" not in message
@@ -0,0 +1,24 @@
+import pytest
+
+from ai_reporter.bot.tools.git.read_file import GitReadFileTool
+from ai_reporter.bot.tools.git.read_files import GitReadFilesTool
+from ai_reporter.error.bot import ToolPropertyInvalidError
+
+FILES = {"a.txt": "one\ntwo\nthree\n", "image.bin": "PNG\0\x01\x02" * 10}
+
+def test_read_line_range(origin, repository_manager):
+    url = origin(FILES)
+    message = GitReadFileTool(state={"repository_manager": repository_manager}).execute(url, "a.txt", start_line=2, end_line=3).message
+    assert message == "FILE: a.txt\nLINES: 2-3 of 3\n2| two\n3| three"
+
+def test_binary_file_is_not_returned(origin, repository_manager):
+    url = origin(FILES)
+    message = GitReadFileTool(state={"repository_manager": repository_manager}).execute(url, "image.bin").message
+    assert message == "FILE: image.bin\n(binary file, 60 bytes)"
+    message = GitReadFilesTool(state={"repository_manager": repository_manager}).execute(url, ["image.bin", "a.txt:1"]).message
+    assert message == "FILE: image.bin\n(binary file, 60 bytes)\n\nFILE: a.txt\nLINES: 1-1 of 3\n1| one"
+
+def test_reversed_line_range_is_rejected(origin, repository_manager):
+    url = origin(FILES)
+    with pytest.raises(ToolPropertyInvalidError):
+        GitReadFileTool(state={"repository_manager": repository_manager}).execute(url, "a.txt", start_line=3, end_line=2)
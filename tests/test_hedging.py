@@ -0,0 +1,71 @@
+import asyncio
+import time
+import uuid
+
+from ai_reporter import Prompt, PropertyDefinition
+from ai_reporter.bot.client.hedging import HedgingPolicy, LatencyTracker
+from ai_reporter.bot.client.openai_client import OpenAIClient
+
+# hedge after 0.3 seconds, the latencies of the tests' first requests are never enough samples
+HEDGING = {"initial_delay": 0.3, "min_delay": 0.1, "min_samples": 1000}
+
+def prompt() -> Prompt:
+    # a unique model keeps the process wide latency trackers of tests apart
+    return Prompt("test", [PropertyDefinition("summary", required=True)], model="test-%s" % uuid.uuid4().hex)
+
+def wait_for(condition, timeout : float = 10.0) -> bool:
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end: return False
+        time.sleep(0.05)
+    return True
+
+def test_slow_request_is_hedged(stub):
+    server = stub(["sleep:3", "ok"])
+    client = OpenAIClient(api_key="test", base_url=server.url, hedging=HEDGING)
+    start = time.monotonic()
+    results = client.run(prompt())
+    assert time.monotonic() - start < 2
+    assert results.values == {"summary": "ok"}
+    assert len(server.requests) == 2
+    # measured on the server, the first request arrives after connecting
+    assert server.times[1] - server.times[0] >= 0.2
+    assert (results.input_tokens, results.output_tokens()) == (100, 10)
+    # the sync client can't interrupt the slow request, its usage is counted once it finishes
+    assert wait_for(lambda: results.hedged_tokens == 110)
+
+def test_slow_request_is_hedged_and_cancelled_async(stub):
+    server = stub(["sleep:3", "ok"])
+    client = OpenAIClient(api_key="test", base_url=server.url, hedging=HEDGING)
+    start = time.monotonic()
+    results = asyncio.run(client.run_async(prompt()))
+    assert time.monotonic() - start < 2
+    assert results.values == {"summary": "ok"}
+    assert len(server.requests) == 2
+    assert results.input_tokens == 100
+    # the cancelled request is counted with its estimated input tokens
+    assert 0 < results.hedged_tokens < 1000
+
+def test_fast_request_is_not_hedged(stub):
+    server = stub(["ok"])
+    client = OpenAIClient(api_key="test", base_url=server.url, hedging=HEDGING)
+    results = client.run(prompt())
+    assert len(server.requests) == 1
+    assert results.hedged_tokens == 0
+
+def test_failed_hedge_falls_back_to_slow_request(stub):
+    server = stub(["sleep:1", "500"])
+    client = OpenAIClient(api_key="test", base_url=server.url, hedging=HEDGING, max_retries=0)
+    results = client.run(prompt())
+    assert results.values == {"summary": "ok"}
+    assert len(server.requests) == 2
+    assert results.hedged_tokens == 0
+
+def test_hedging_delay_follows_latency_percentile():
+    latencies = LatencyTracker()
+    policy = HedgingPolicy(percentile=90, min_delay=0.5, max_delay=10, initial_delay=5, min_samples=10)
+    assert policy.delay(latencies) == 5
+    for i in range(1, 11): latencies.record(float(i))
+    assert policy.delay(latencies) == 9
+    for i in range(100): latencies.record(0.1)
+    assert policy.delay(latencies) == 0.5
@@ -0,0 +1,78 @@
+import time
+import uuid
+
+import openai
+import pytest
+
+from ai_reporter import Prompt, PropertyDefinition
+from ai_reporter.bot.client.openai_client import OpenAIClient
+from ai_reporter.bot.client.rate_limit import RateLimiter, get_rate_limiter
+
+def prompt() -> Prompt:
+    # a unique model keeps the process wide rate limiters of tests apart
+    return Prompt("test", [PropertyDefinition("summary", required=True)], model="test-%s" % uuid.uuid4().hex)
+
+def test_rate_limited_request_is_retried_after_retry_after(stub):
+    server = stub(["429", "500", "ok"], retry_after_ms=200)
+    client = OpenAIClient(api_key="test", base_url=server.url, max_retries=2)
+    results = client.run(prompt())
+    assert results.values == {"summary": "ok"}
+    assert len(server.requests) == 3
+    # retry-after is used for both errors
+    assert server.times[1] - server.times[0] >= 0.2
+    assert server.times[2] - server.times[1] >= 0.2
+
+def test_error_is_raised_after_max_retries(stub):
+    server = stub(["500", "500", "500"], retry_after_ms=10)
+    client = OpenAIClient(api_key="test", base_url=server.url, max_retries=1)
+    with pytest.raises(openai.InternalServerError):
+        client.run(prompt())
+    assert len(server.requests) == 2
+
+def test_client_error_is_not_retried(stub):
+    server = stub(["400"])
+    client = OpenAIClient(api_key="test", base_url=server.url, max_retries=3)
+    with pytest.raises(openai.BadRequestError):
+        client.run(prompt())
+    assert len(server.requests) == 1
+
+def test_requests_per_minute_spreads_requests(stub):
+    server = stub()
+    # a bucket of two requests refilled at 10 requests per second
+    client = OpenAIClient(api_key="test", base_url=server.url, requests_per_minute=600)
+    get_rate_limiter(server.url, "spread", 600)._requests = 2.0
+    start = time.monotonic()
+    for _ in range(4): client.run(Prompt("test", [PropertyDefinition("summary", required=True)], model="spread"))
+    # the last two requests wait for the bucket to refill
+    assert time.monotonic() - start >= 0.15
+
+def test_token_bucket_wait():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600)
+    assert limiter.reserve(300) == 0
+    assert limiter.reserve(300) == 0
+    # the bucket is empty, 300 tokens refill in 30 seconds
+    assert limiter.reserve(300) == pytest.approx(30, abs=0.1)
+    assert not limiter.try_acquire(1)
+
+def test_token_bucket_adjust_returns_unused_tokens():
+    limiter = RateLimiter(tokens_per_minute=1000)
+    assert limiter.reserve(1000) == 0
+    limiter.adjust(1000, 400)
+    assert limiter.reserve(600) == 0
+
+def test_pause_holds_back_requests():
+    limiter = RateLimiter()
+    limiter.pause(5)
+    assert limiter.reserve(1) == pytest.approx(5, abs=0.1)
+
+def test_shared_limiter_keeps_lowest_limits():
+    model = uuid.uuid4().hex
+    limiter = get_rate_limiter("http://test", model, 100, 0)
+    limiter.reserve(10)
+    assert get_rate_limiter("http://test", model, 200, 5000) is limiter
+    assert (limiter.requests_per_minute, limiter.tokens_per_minute) == (100, 5000)
+    # the bucket isn't reset by other clients
+    assert limiter._requests < 100
+    get_rate_limiter("http://test", model, 50, 0)
+    assert (limiter.requests_per_minute, limiter.tokens_per_minute) == (50, 5000)
+    assert limiter._requests <= 50
@@ -0,0 +1,84 @@
+import os
+
+from git import Repo
+
+from ai_reporter.bot.tools.git.commit_index import CommitIndex
+from ai_reporter.bot.tools.git.repository import fetch_missing_blobs
+
+def used_at(repository_manager, url : str, last_used : float):
+    """ Set when the clone was last used. """
+    os.utime(repository_manager.path(url) + ".json", (last_used, last_used))
+
+def test_least_recently_used_clones_are_evicted(origin, repository_manager):
+    urls = list(map(lambda i: origin({"a.txt": "a\n"}, name="origin%d" % i), range(3)))
+    for i, url in enumerate(urls):
+        repository_manager.open(url)
+        used_at(repository_manager, url, 1000 + i)
+    # the budget only fits the most recently used clone
+    repository_manager.evict(repository_manager._metadata(urls[2])["size"])
+    assert list(map(lambda u: os.path.exists(repository_manager.path(u)), urls)) == [False, False, True]
+    # the lock and metadata files of evicted clones are deleted too
+    assert not any(map(lambda f: f.startswith(os.path.basename(repository_manager.path(urls[0]))),
+        os.listdir(os.path.join(repository_manager.work_path, "repos"))))
+
+def test_clones_in_use_are_skipped(origin, repository_manager):
+    urls = list(map(lambda i: origin({"a.txt": "a\n"}, name="origin%d" % i), range(2)))
+    with repository_manager.use(urls[0]):
+        repository_manager.open(urls[1])
+        used_at(repository_manager, urls[0], 1000)
+        repository_manager.evict(0)
+        # the least recently used clone is in use, the next one is evicted instead
+        assert os.path.exists(repository_manager.path(urls[0]))
+        assert not os.path.exists(repository_manager.path(urls[1]))
+    repository_manager.evict(0)
+    assert not os.path.exists(repository_manager.path(urls[0]))
+
+def test_evicted_clone_is_cloned_again(origin, repository_manager):
+    url = origin({"a.txt": "a\n"})
+    repository_manager.open(url)
+    repository_manager.evict(0)
+    with repository_manager.use(url) as repo:
+        assert repo.head.commit.tree["a.txt"].data_stream.read() == b"a\n"
+
+def missing_blobs(repo) -> int:
+    return sum(map(lambda l: l.startswith("?"), repo.git.rev_list("--objects", "--missing=print", "--all").splitlines()))
+
+def test_blobless_clone_fetches_blobs_on_demand(origin, repository_manager):
+    url = origin({"a.txt": "a\n", "b.txt": "b\n"}, {"a.txt": "a2\n"})
+    repo = repository_manager.open(url, clone_filter="blob:none")
+    assert repo.remotes.origin.config_reader.get_value("promisor")
+    assert missing_blobs(repo) == 3
+    assert repo.head.commit.tree["a.txt"].data_stream.read() == b"a2\n"
+    fetch_missing_blobs(repo, repo.head.commit.hexsha)
+    # only the blob of the old version of a.txt is left
+    assert missing_blobs(repo) == 1
+
+def test_shallow_clone_has_limited_history(origin, repository_manager):
+    url = origin({"a.txt": "1\n"}, {"a.txt": "2\n"}, {"a.txt": "3\n"})
+    repo = repository_manager.open(url, clone_depth=1)
+    assert os.path.exists(os.path.join(repo.git_dir, "shallow"))
+    assert list(map(lambda c: c.message.strip(), repo.iter_commits())) == ["commit 3"]
+    assert repo.head.commit.tree["a.txt"].data_stream.read() == b"3\n"
+
+def test_clone_is_updated_after_fetch_interval(origin, repository_manager):
+    url = origin({"a.txt": "1\n"})
+    repository_manager.open(url, clone_filter="blob:none", clone_depth=1)
+    # a second commit in the same origin
+    origin({"a.txt": "2\n"})
+    repo = repository_manager.open(url, fetch_interval=0, clone_filter="blob:none", clone_depth=1)
+    assert repo.head.commit.tree["a.txt"].data_stream.read() == b"2\n"
+
+def test_commit_index_drops_rewritten_history(origin, repository_manager):
+    url = origin({"a.txt": "1\n"}, {"a.txt": "2\n"})
+    repo = repository_manager.open(url)
+    index = CommitIndex(repo)
+    index.update()
+    assert sorted(map(lambda c: c.message, index.query())) == ["commit 1", "commit 2"]
+    # force push a different second commit
+    upstream = Repo(url[len("file://"):])
+    upstream.git.reset("--hard", "HEAD~1")
+    upstream.git.commit("--allow-empty", "-m", "rewritten")
+    repository_manager.open(url, fetch_interval=0)
+    index.update()
+    assert sorted(map(lambda c: c.message, index.query())) == ["commit 1", "rewritten"]
+    assert list(map(lambda c: c.message, index.query(path="a.txt"))) == ["commit 1"]
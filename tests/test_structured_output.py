@@ -0,0 +1,93 @@
+import json
+from types import SimpleNamespace
+
+from openai.types.chat import ChatCompletion
+import pytest
+
+from ai_reporter import Prompt, PropertyDefinition
+from ai_reporter.bot.client.openai_client import OpenAIClient
+from ai_reporter.error.bot import BotTokenBudgetError, ToolPropertyInvalidError
+
+PROPERTIES = [
+    PropertyDefinition("summary", "string", required=True),
+    PropertyDefinition("count", "integer", min=1, max=10, required=True),
+    PropertyDefinition("score", "number", required=True),
+    PropertyDefinition("extra", "object", required=True),
+    PropertyDefinition("tags", "array", required=True),
+    PropertyDefinition("valid", "boolean", required=True),
+    PropertyDefinition("severity", "enum", choices=["low", "high"], required=True),
+]
+
+VALUES = {"summary": "ok", "count": 3, "score": 2, "extra": {"a": 1}, "tags": ["x"], "valid": True, "severity": "low"}
+
+def completion(content : str) -> ChatCompletion:
+    return ChatCompletion.model_validate({
+        "id": "test", "object": "chat.completion", "created": 0, "model": "test",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+    })
+
+class FakeCompletions:
+
+    def __init__(self, contents : list[str]):
+        self.contents = list(contents)
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return completion(self.contents.pop(0))
+
+def run_report(properties : list[PropertyDefinition], contents : list[str]) -> tuple:
+    client = OpenAIClient(api_key="test")
+    completions = FakeCompletions(contents)
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return client.run(Prompt("test", properties, max_error_retry=3)), completions.requests
+
+@pytest.mark.parametrize("prop", PROPERTIES, ids=lambda p: str(p.type))
+def test_schema_value_passes_checks(prop : PropertyDefinition):
+    results, requests = run_report([prop], [json.dumps({prop.name: VALUES[prop.name]})])
+    assert results.values == {prop.name: VALUES[prop.name]}
+    assert len(requests) == 1
+    assert "tools" not in requests[0]
+    schema = requests[0]["response_format"]["json_schema"]["schema"]
+    assert schema["properties"][prop.name]["type"] == prop.to_dict()["type"]
+
+def test_enum_schema_is_string_with_choices():
+    schema = OpenAIClient._response_format(PROPERTIES)["json_schema"]["schema"]
+    assert schema["properties"]["severity"] == {"type": "string", "description": "", "enum": ["low", "high"]}
+
+def test_optional_properties_are_nullable():
+    properties = [PropertyDefinition("severity", "enum", choices=["low", "high"]), PropertyDefinition("score", "number")]
+    response_format = OpenAIClient._response_format(properties)
+    schema = response_format["json_schema"]["schema"]
+    assert response_format["json_schema"]["strict"]
+    assert schema["required"] == ["severity", "score"]
+    assert schema["properties"]["severity"]["type"] == ["string", "null"]
+    assert None in schema["properties"]["severity"]["enum"]
+    results, _ = run_report(properties, [json.dumps({"severity": None, "score": 1.5})])
+    assert results.values == {"score": 1.5}
+
+def test_invalid_values_are_retried():
+    results, requests = run_report(PROPERTIES, ["not json", json.dumps({**VALUES, "severity": "medium"}), json.dumps(VALUES)])
+    assert results.values == VALUES
+    assert len(requests) == 3
+
+@pytest.mark.parametrize("value", ["high", 1.5, True], ids=["string", "float", "bool"])
+def test_wrong_integer_type_is_rejected(value):
+    with pytest.raises(ToolPropertyInvalidError):
+        run_report([PropertyDefinition("count", "integer", required=True)], [json.dumps({"count": value})] * 3)
+
+def test_token_budget_caps_response():
+    client = OpenAIClient(api_key="test")
+    completions = FakeCompletions([json.dumps({"summary": "ok"})])
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    client.run(Prompt("test", [PropertyDefinition("summary", required=True)], token_budget=2000))
+    assert 0 < completions.requests[0]["max_completion_tokens"] < 2000
+
+def test_response_cut_off_by_token_budget_is_rejected():
+    client = OpenAIClient(api_key="test")
+    response = completion(json.dumps({"summary": "o"}))
+    response.choices[0].finish_reason = "length"
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: response)))
+    with pytest.raises(BotTokenBudgetError):
+        client.run(Prompt("test", [PropertyDefinition("summary", required=True)], token_budget=2000))
@@ -0,0 +1,24 @@
+import threading
+
+from git import Repo
+
+from ai_reporter.bot.tools.git.symbols import SymbolIndex
+
+SOURCE = "class Foo:\n    def bar(self):\n        pass\n\ndef baz():\n    pass\n"
+
+def test_concurrent_builds_parse_each_blob_once(origin, repository_manager):
+    url = origin(dict(map(lambda i: ("m%d.py" % i, SOURCE.replace("Foo", "Foo%d" % i)), range(50))))
+    path = repository_manager.open(url).working_dir
+    results, errors = [], []
+    def find():
+        # repository handles aren't thread safe, each thread opens its own
+        repo = Repo(path)
+        try: results.append(SymbolIndex(repo).find(repo.head.commit, "Foo*", limit=1000))
+        except Exception as e: errors.append(e)
+    threads = list(map(lambda _: threading.Thread(target=find), range(8)))
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert not errors
+    assert all(map(lambda r: len(r) == 50, results))
+    repo = Repo(path)
+    assert list(map(lambda s: s.qualified_name, SymbolIndex(repo).outline(repo.head.commit, "m1.py"))) == ["Foo1", "Foo1.bar", "baz"]
@@ -0,0 +1,35 @@
+import os
+
+from ai_reporter.bot.tools.git.trigram_index import MAX_DISK_INDEXES, TrigramIndex
+
+def read_blobs(monkeypatch) -> list[str]:
+    """ Record the blobs read while building indexes. """
+    out = []
+    read_blob = TrigramIndex._read_blob
+    monkeypatch.setattr(TrigramIndex, "_read_blob", staticmethod(lambda repo, sha: out.append(sha) or read_blob(repo, sha)))
+    return out
+
+def test_index_is_updated_from_nearest_indexed_commit(origin, repository_manager, monkeypatch):
+    files = dict(map(lambda i: ("f%d.txt" % i, "file %d\n" % i), range(10)))
+    url = origin(files, {"a.txt": "alpha\n"}, {"b.txt": "beta\n"}, {"f0.txt": "gamma\n"})
+    repo = repository_manager.open(url)
+    commits = list(reversed(list(repo.iter_commits())))
+    TrigramIndex.build(commits[0])
+    blobs = read_blobs(monkeypatch)
+    # two commits ahead of the indexed one, only the blobs changed since are read
+    TrigramIndex.build(commits[2])
+    assert sorted(blobs) == sorted([commits[2].tree["a.txt"].hexsha, commits[2].tree["b.txt"].hexsha])
+    index = TrigramIndex(TrigramIndex._index_path(repo, commits[2].hexsha))
+    assert list(map(lambda d: d[0], index.candidates("beta"))) == ["b.txt"]
+    assert list(map(lambda d: d[0], index.candidates("file 0"))) == ["f0.txt"]
+
+def test_old_indexes_are_deleted(origin, repository_manager):
+    url = origin(*map(lambda i: {"a.txt": "version %d\n" % i}, range(MAX_DISK_INDEXES + 2)))
+    repo = repository_manager.open(url)
+    commits = list(reversed(list(repo.iter_commits())))
+    for i, commit in enumerate(commits):
+        TrigramIndex.build(commit)
+        # keep the build order apart on file systems with coarse modification times
+        os.utime(TrigramIndex._index_path(repo, commit.hexsha), (i, i))
+    paths = TrigramIndex._index_files(repo)
+    assert paths == list(map(lambda c: TrigramIndex._index_path(repo, c.hexsha), reversed(commits[-MAX_DISK_INDEXES:])))